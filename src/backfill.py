@@ -0,0 +1,169 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from logger import Logger, get_logger
+from quota import QuotaExceededError
+from video import Video
+from watcher import FileWatcher
+
+log: Logger = get_logger(__name__)
+
+
+@dataclass
+class BackfillSummary:
+    found: int = 0
+    already_tracked: int = 0
+    invalid: int = 0
+    queued: int = 0
+    uploaded: int = 0
+    # Uploaded by another node in the meantime
+    claimed_elsewhere: int = 0
+    failed: int = 0
+    # Left queued until the YouTube quota resets
+    deferred: int = 0
+    queued_bytes: int = 0
+    uploaded_bytes: int = 0
+    scan_seconds: float = 0.0
+    upload_seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.found} files found, {self.already_tracked} already uploaded, "
+            f"{self.invalid} not valid, {self.queued} queued "
+            f"({self.queued_bytes / 1024**3:.1f} GB) in {self.scan_seconds:.1f}s; "
+            f"{self.uploaded} uploaded ({self.uploaded_bytes / 1024**3:.1f} GB), "
+            f"{self.claimed_elsewhere} claimed by other nodes, "
+            f"{self.failed} failed, {self.deferred} deferred by the YouTube quota "
+            f"in {self.upload_seconds:.1f}s"
+        )
+
+
+def _inspect(file: Path) -> Optional[tuple[float, int]]:
+    """Validate a file and stat it.
+
+    Returns:
+        Optional[tuple[float, int]]: (mtime, size), or None if the file is not valid.
+    """
+    try:
+        if not Video(file).is_valid():
+            return None
+        stat = file.stat()
+    except (ValueError, AttributeError, OSError):
+        # Unparsable names (e.g. no difficulty) or files gone in the meantime
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+def scan(
+    watcher: FileWatcher, summary: BackfillSummary, workers: int = 16
+) -> list[tuple[Path, int]]:
+    """List the directory once and validate the untracked files in parallel.
+
+    Stat calls are the expensive part on network shares, so they run
+    on a thread pool.
+
+    Returns:
+        list[tuple[Path, int]]: The valid, untracked files and their size,
+            oldest first.
+    """
+    start: float = time.perf_counter()
+    tracked: set[str] = watcher.tracked_files()
+    with os.scandir(watcher.directory) as entries:
+        files: list[Path] = [Path(entry.path) for entry in entries if entry.is_file()]
+    summary.found = len(files)
+
+    candidates: list[Path] = [file for file in files if str(file) not in tracked]
+    summary.already_tracked = summary.found - len(candidates)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_inspect, candidates))
+
+    valid: list[tuple[float, Path, int]] = [
+        (result[0], file, result[1])
+        for file, result in zip(candidates, results)
+        if result is not None
+    ]
+    valid.sort()
+    summary.invalid = len(candidates) - len(valid)
+    summary.queued = len(valid)
+    summary.queued_bytes = sum(size for _, _, size in valid)
+    summary.scan_seconds = time.perf_counter() - start
+    return [(file, size) for _, file, size in valid]
+
+
+def drain(
+    watcher: FileWatcher,
+    handle: Callable[[Video], Optional[str]],
+    summary: BackfillSummary,
+) -> None:
+    """Upload every queued file, oldest first.
+
+    Failures are logged and counted, the file stays queued for the next run.
+    Once the YouTube quota is exhausted the rest of the queue is left for
+    the next run as well.
+
+    Args:
+        watcher (FileWatcher): The tracking database.
+        handle (Callable[[Video], Optional[str]]): Uploads and tracks a video,
+            returns None if another node claimed it.
+        summary (BackfillSummary): Updated with the results.
+    """
+    start: float = time.perf_counter()
+    queued: list[str] = watcher.queued_files()
+    for i, file_path in enumerate(queued, 1):
+        video = Video(Path(file_path))
+        log.info(f"Backfill {i}/{len(queued)}: {video.title}")
+        try:
+            size: int = video.file.stat().st_size
+            video_id: Optional[str] = handle(video)
+        except QuotaExceededError:
+            summary.deferred = len(queued) - i + 1
+            break
+        except Exception as e:
+            log.error(f"Backfill failed for {video.title}: {e}")
+            summary.failed += 1
+            continue
+        if video_id is None:
+            summary.claimed_elsewhere += 1
+            continue
+        summary.uploaded += 1
+        summary.uploaded_bytes += size
+    summary.upload_seconds = time.perf_counter() - start
+
+
+def backfill(
+    watcher: FileWatcher,
+    handle: Optional[Callable[[Video], Optional[str]]],
+    dry_run: bool = False,
+    workers: int = 16,
+) -> BackfillSummary:
+    """Queue every valid, untracked file of the directory in bulk and
+    upload the queue once.
+
+    Args:
+        watcher (FileWatcher): The tracking database.
+        handle (Optional[Callable[[Video], Optional[str]]]): Uploads and tracks
+            a video. Not needed for dry runs.
+        dry_run (bool): Only report what would be uploaded.
+        workers (int): Threads validating files in parallel.
+
+    Returns:
+        BackfillSummary: What was found and uploaded.
+    """
+    summary = BackfillSummary()
+    files: list[tuple[Path, int]] = scan(watcher, summary, workers)
+
+    if dry_run:
+        for file, size in files:
+            log.info(f"Would upload: {file.name} ({size / 1024**2:.0f} MB)")
+        log.info(f"Dry run: {summary}")
+        return summary
+
+    watcher.enqueue_many([str(file) for file, _ in files])
+    drain(watcher, handle, summary)
+    log.info(f"Backfill finished: {summary}")
+    return summary
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Optional
 
 from dynaconf import Dynaconf
 from pydantic import BaseModel, DirectoryPath, Field
@@ -29,6 +29,12 @@ class Database(BaseModel):
     directory: DirectoryPath
     # The name of the database file
     name: str
+    # SQLite journal mode, WAL does not work on network shares
+    journal_mode: Literal["WAL", "DELETE", "TRUNCATE", "PERSIST"] = "WAL"
+    # Seconds to wait for a lock held by another connection or process
+    busy_timeout: float = 30.0
+    # Writes queued within this many milliseconds are committed together
+    commit_interval_ms: float = 5.0
 
     @property
     def path(self) -> Path:
@@ -62,15 +68,110 @@ class YoutubeVideo(BaseModel):
     description: str
     # Tags to be applied to the video
     tags: list[str]
+    # Playlists to add the video to, by difficulty or boss name
+    playlists: dict[str, str] = {}
+    # Poll YouTube for the processing status of uploaded videos
+    track_processing: bool = False
+
+
+class YoutubeQuota(BaseModel):
+    # Daily quota of the Google Cloud project, in units
+    daily_limit: int = 10_000
+    # Units charged per API call
+    costs: dict[str, int] = {
+        "videos.insert": 1600,
+        "videos.list": 1,
+        "playlistItems.insert": 50,
+    }
+
+
+class Archive(BaseModel):
+    # The directory where uploaded VODs are archived
+    directory: DirectoryPath
+    # Move the VODs instead of linking/copying them
+    move: bool = False
+
+    @property
+    def path(self) -> Path:
+        """Returns the fully qualified path to the archive directory"""
+        return Path(ROOT_DIR, self.directory)
+
+
+class Retention(BaseModel):
+    # Delete uploaded VODs from the recorder directory when its drive fills up
+    enabled: bool = False
+    # Disk usage (in percent) above which uploaded VODs are deleted, oldest first
+    max_usage_percent: float = Field(default=90.0, gt=0, le=100)
+
+
+class FanOut(BaseModel):
+    # Size of the chunks read from each file, in megabytes
+    chunk_size_mb: int = 4
+    # Chunks buffered per destination before a slow one reads the file on its own
+    buffer_chunks: int = 16
+
+    @property
+    def chunk_size(self) -> int:
+        """Returns the chunk size in bytes"""
+        return self.chunk_size_mb * 1024 * 1024
+
+
+class Maintenance(BaseModel):
+    # Uploads older than this many days are moved to the archive table, 0 disables
+    archive_after_days: int = Field(default=180, ge=0)
+    # Hours between ANALYZE runs, 0 disables
+    analyze_every_hours: float = 24.0
+    # Hours between VACUUM runs, 0 disables
+    vacuum_every_hours: float = 168.0
+
+
+class Cluster(BaseModel):
+    # Name of this uploader node, defaults to the host name and process id
+    node: Optional[str] = None
+    # Seconds a claim on a VOD stays valid without a heartbeat. Expiries use
+    # the clock of the database's file system, keep the nodes synced with NTP
+    lease_seconds: float = Field(default=120.0, gt=0)
+
+
+class Logging(BaseModel):
+    # Also write the log to logs/app.log
+    file: bool = True
+    # Size (in megabytes) at which the log file is rotated
+    max_size_mb: int = 10
+    # Hours after which the log file is rotated regardless of its size, 0 disables
+    rotate_every_hours: float = 24.0
+    # Number of rotated log files to keep
+    backup_count: int = 14
+    # Gzip the rotated log files
+    compress: bool = True
+    # Write structured JSON lines instead of plain text
+    json_lines: bool = False
+    # Repetitive messages (e.g. upload progress) let through per window, 0 disables
+    rate_limit: int = 20
+    # Length of the rate limiting window, in seconds
+    rate_limit_seconds: float = 60.0
+
+    @property
+    def max_bytes(self) -> int:
+        """Returns the rotation size in bytes"""
+        return self.max_size_mb * 1024 * 1024
 
 
 class Settings(BaseModel):
     log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+    logging: Logging = Field(default_factory=Logging)
     warcraft: WarcraftVods = Field(alias="warcraft_vods")
     youtube: YoutubeVideo = Field(alias="youtube_video")
     auth: Authentication = Field(alias="authentication")
     database: Database
-    uploader: str
+    # One uploader, or several to fan out to (the first one is the primary)
+    uploader: str | list[str]
+    fan_out: FanOut = Field(default_factory=FanOut)
+    youtube_quota: YoutubeQuota = Field(default_factory=YoutubeQuota)
+    archive: Optional[Archive] = None
+    retention: Retention = Field(default_factory=Retention)
+    cluster: Cluster = Field(default_factory=Cluster)
+    maintenance: Maintenance = Field(default_factory=Maintenance)
 
     @classmethod
     def from_dynaconf(cls, _d: Dynaconf):
@@ -0,0 +1,316 @@
+import queue
+import sqlite3
+import statistics
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, TypeVar
+
+from config import settings
+from logger import Logger, get_logger
+
+__all__ = ["Database", "DatabaseStats", "connect"]
+
+log: Logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Number of recent commits the statistics are computed over
+STATS_WINDOW = 1000
+
+
+@dataclass
+class DatabaseStats:
+    commits: int
+    writes: int
+    # Writes per commit
+    batch_size_mean: float
+    batch_size_max: int
+    # Time from queuing a write to its commit, in milliseconds
+    latency_p50_ms: float
+    latency_p99_ms: float
+    latency_max_ms: float
+
+
+class _Write:
+    __slots__ = ("fn", "future", "queued_at", "transaction")
+
+    def __init__(self, fn: Callable[[sqlite3.Connection], Any], transaction: bool = True) -> None:
+        self.fn = fn
+        self.transaction: bool = transaction
+        self.future: Future = Future()
+        self.queued_at: float = time.perf_counter()
+
+
+class _Reader:
+    """Holds the read connection of a thread in its thread-local storage,
+    which drops it when the thread exits.
+    """
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn: sqlite3.Connection = conn
+
+
+def _close_reader(
+    conn: sqlite3.Connection, readers: set[sqlite3.Connection], lock: threading.RLock
+) -> None:
+    with lock:
+        readers.discard(conn)
+    conn.close()
+
+
+class Database:
+    """Thread-safe access to an SQLite database.
+
+    All writes go through a single writer thread which commits whatever
+    was queued within `commit_interval` seconds as one transaction.
+    Each thread reads through a connection of its own, closed when the
+    thread exits.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        journal_mode: str = "WAL",
+        busy_timeout: float = 30.0,
+        commit_interval: float = 0.005,
+        max_batch: int = 1000,
+    ) -> None:
+        self.path: Path = path
+        self.journal_mode: str = journal_mode
+        self.busy_timeout: float = busy_timeout
+        self.commit_interval: float = commit_interval
+        self.max_batch: int = max_batch
+
+        self._queue: queue.Queue[Optional[_Write]] = queue.Queue()
+        self._local = threading.local()
+        self._readers: set[sqlite3.Connection] = set()
+        # Reentrant: a reader may be finalized while close() holds the lock
+        self._readers_lock = threading.RLock()
+        self._commits: int = 0
+        self._writes: int = 0
+        self._batch_sizes: deque[int] = deque(maxlen=STATS_WINDOW)
+        self._latencies: deque[float] = deque(maxlen=STATS_WINDOW)
+
+        self._writer_conn: sqlite3.Connection = self._connect(check_same_thread=False)
+        self._writer_conn.isolation_level = None  # transactions are managed by hand
+        mode = self._writer_conn.execute(f"PRAGMA journal_mode={journal_mode}").fetchone()[0]
+        if mode.upper() != journal_mode.upper():
+            log.warning(f"{path} uses journal mode {mode}, {journal_mode} is not supported")
+        self._writer = threading.Thread(target=self._write_loop, name="db-writer", daemon=True)
+        self._writer.start()
+
+    # -- Connections --
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, check_same_thread=check_same_thread
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        if self.journal_mode.upper() == "WAL":
+            # Safe in WAL mode, commits no longer fsync
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    @property
+    def reader(self) -> sqlite3.Connection:
+        """Returns the read connection of the calling thread"""
+        holder: Optional[_Reader] = getattr(self._local, "reader", None)
+        if holder is None:
+            # Only used by this thread, but closed by close() from any thread
+            conn = self._connect(check_same_thread=False)
+            holder = _Reader(conn)
+            weakref.finalize(holder, _close_reader, conn, self._readers, self._readers_lock)
+            self._local.reader = holder
+            with self._readers_lock:
+                self._readers.add(conn)
+        return holder.conn
+
+    def read(self, sql: str, params: Iterable[Any] = ()) -> list[tuple]:
+        """Run a query on the calling thread's connection and fetch all rows."""
+        return self.reader.execute(sql, tuple(params)).fetchall()
+
+    # -- Writes --
+    def submit(
+        self, fn: Callable[[sqlite3.Connection], T], wait: bool = True, transaction: bool = True
+    ) -> T | Future:
+        """Run `fn` with the writer connection, inside the next group commit.
+
+        `fn` runs in a savepoint: if it raises, only its own changes are
+        rolled back and the exception is raised to the caller.
+
+        Args:
+            fn (Callable[[sqlite3.Connection], T]): Does the writing.
+            wait (bool): Block until the changes are committed.
+            transaction (bool): Run `fn` on its own, outside of any transaction,
+                for statements like VACUUM.
+
+        Returns:
+            T | Future: The result of `fn`, or a future of it if not waiting.
+        """
+        if not self._writer.is_alive():
+            raise sqlite3.ProgrammingError(f"Database {self.path} is closed")
+        write = _Write(fn, transaction)
+        self._queue.put(write)
+        return write.future.result() if wait else write.future
+
+    def execute(self, sql: str, params: Iterable[Any] = (), wait: bool = True) -> int | Future:
+        """Run a write statement in the next group commit.
+
+        Returns:
+            int | Future: The number of rows changed, or a future of it if not waiting.
+        """
+        params = tuple(params)
+        return self.submit(lambda conn: conn.execute(sql, params).rowcount, wait=wait)
+
+    def executemany(
+        self, sql: str, seq_of_params: Iterable[Iterable[Any]], wait: bool = True
+    ) -> int | Future:
+        """Run a write statement for each set of parameters in the next group commit.
+
+        Returns:
+            int | Future: The number of rows changed, or a future of it if not waiting.
+        """
+        rows = [tuple(params) for params in seq_of_params]
+        return self.submit(lambda conn: conn.executemany(sql, rows).rowcount, wait=wait)
+
+    def flush(self) -> None:
+        """Wait until every write queued so far is committed."""
+        self.submit(lambda conn: None)
+
+    def _write_loop(self) -> None:
+        # A write taken from the queue that cannot join the current batch
+        pending: Optional[_Write] = None
+        while True:
+            write = pending if pending is not None else self._queue.get()
+            pending = None
+            if write is None:
+                break
+            if not write.transaction:
+                self._execute(write)
+                continue
+            batch: list[_Write] = [write]
+            deadline: float = time.perf_counter() + self.commit_interval
+            stop: bool = False
+            while len(batch) < self.max_batch:
+                remaining: float = deadline - time.perf_counter()
+                try:
+                    write = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if write is None:
+                    stop = True
+                    break
+                if not write.transaction:
+                    pending = write
+                    break
+                batch.append(write)
+
+            self._commit(batch)
+            if stop:
+                break
+        self._writer_conn.close()
+
+    def _commit(self, batch: list[_Write]) -> None:
+        conn = self._writer_conn
+        results: list[tuple[_Write, Any, Optional[BaseException]]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for write in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    result = write.fn(conn)
+                    conn.execute("RELEASE write")
+                    results.append((write, result, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    results.append((write, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            log.error(f"Group commit of {len(batch)} writes failed: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(write, None, e) for write in batch]
+
+        committed_at: float = time.perf_counter()
+        self._commits += 1
+        self._writes += len(batch)
+        self._batch_sizes.append(len(batch))
+        for write, result, error in results:
+            self._latencies.append(committed_at - write.queued_at)
+            if error is None:
+                write.future.set_result(result)
+            else:
+                write.future.set_exception(error)
+
+    def _execute(self, write: _Write) -> None:
+        """Run a write outside of a transaction."""
+        try:
+            result = write.fn(self._writer_conn)
+        except Exception as e:
+            write.future.set_exception(e)
+        else:
+            write.future.set_result(result)
+        self._commits += 1
+        self._writes += 1
+        self._batch_sizes.append(1)
+        self._latencies.append(time.perf_counter() - write.queued_at)
+
+    # -- Lifecycle --
+    def stats(self) -> DatabaseStats:
+        """Returns the group commit statistics over the recent commits"""
+        sizes: list[int] = list(self._batch_sizes) or [0]
+        latencies: list[float] = sorted(self._latencies) or [0.0]
+        return DatabaseStats(
+            commits=self._commits,
+            writes=self._writes,
+            batch_size_mean=statistics.fmean(sizes),
+            batch_size_max=max(sizes),
+            latency_p50_ms=latencies[len(latencies) // 2] * 1000,
+            latency_p99_ms=latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000,
+            latency_max_ms=latencies[-1] * 1000,
+        )
+
+    def close(self) -> None:
+        """Commit the queued writes and close every connection."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        _databases.pop(_key(self.path), None)
+
+
+_databases: dict[str, Database] = {}
+_databases_lock = threading.Lock()
+
+
+def _key(path: Path) -> str:
+    return str(Path(path).resolve())
+
+
+def connect(path: Path, **kwargs: Any) -> Database:
+    """Get the shared Database for a file, so each file has a single writer.
+
+    Args:
+        path (Path): The database file.
+        **kwargs: Passed to Database when it is opened the first time,
+            defaults to the database settings.
+    """
+    kwargs.setdefault("journal_mode", settings.database.journal_mode)
+    kwargs.setdefault("busy_timeout", settings.database.busy_timeout)
+    kwargs.setdefault("commit_interval", settings.database.commit_interval_ms / 1000)
+    with _databases_lock:
+        db: Optional[Database] = _databases.get(_key(path))
+        if db is None or not db._writer.is_alive():
+            db = Database(path, **kwargs)
+            _databases[_key(path)] = db
+        return db
@@ -0,0 +1,134 @@
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Optional
+
+from config import settings
+from logger import Logger, get_logger
+from watcher import FileWatcher
+
+log: Logger = get_logger(__name__)
+
+
+def node_name() -> str:
+    """Returns the name this uploader claims VODs under"""
+    return settings.cluster.node or f"{socket.gethostname()}-{os.getpid()}"
+
+
+def sync_clock(watcher: FileWatcher) -> float:
+    """Base the leases of this node on the clock of the database's file system.
+
+    Lease expiries are timestamps compared between nodes, so all of them
+    have to use the same clock. A file server sets the modification time
+    of the files it stores, which gives its clock; on a local disk the
+    offset is about zero. Clocks still drifting apart by more than a
+    third of the lease are reported: keep the nodes synced with NTP.
+
+    Returns:
+        float: Seconds to add to this node's clock.
+    """
+    # One file per node, they may start at the same time
+    probe = Path(f"{watcher.db_path}.{node_name()}.clock")
+    try:
+        before: float = time.time()
+        probe.write_bytes(b"")
+        after: float = time.time()
+        offset: float = probe.stat().st_mtime - (before + after) / 2
+        probe.unlink()
+    except OSError as e:
+        log.warning(f"Could not read the clock of {probe.parent}, using the local clock: {e}")
+        return watcher.clock_offset
+
+    # Coarse timestamps (e.g. 2 seconds on FAT) read as a small offset
+    if abs(offset) > settings.cluster.lease_seconds / 3:
+        log.warning(
+            f"The clock of this node is {offset:+.1f}s off the clock of {probe.parent}, "
+            "leases follow the latter. Sync the clocks of all nodes with NTP"
+        )
+    watcher.clock_offset = offset
+    return offset
+
+
+class Lease:
+    """A node's claim on a VOD while it uploads it.
+
+    The claim expires after `duration` seconds unless it is renewed, so the
+    VODs of a crashed node are taken over by the others. While the lease is
+    held as a context manager, a background thread renews it every third of
+    its duration. If the block raises, the VOD is released and queued again.
+    """
+
+    def __init__(
+        self,
+        watcher: FileWatcher,
+        file_path: str,
+        node: Optional[str] = None,
+        duration: Optional[float] = None,
+    ) -> None:
+        self.watcher: FileWatcher = watcher
+        self.file_path: str = file_path
+        self.node: str = node or node_name()
+        self.duration: float = duration or settings.cluster.lease_seconds
+        # Set when a renewal failed, another node may be uploading the VOD too
+        self.lost: bool = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def acquire(self) -> bool:
+        """Claim the VOD.
+
+        Returns:
+            bool: False if another node holds a valid claim or already uploaded it.
+        """
+        return self.watcher.claim(self.file_path, self.node, self.duration)
+
+    def complete(self, video_id: str, digest: Optional[str] = None) -> bool:
+        """Record the upload of the VOD under this claim.
+
+        Returns:
+            bool: False if another node took the claim over meanwhile,
+                it may have uploaded the VOD too.
+        """
+        completed: bool = self.watcher.finish_upload(self.file_path, self.node, video_id, digest)
+        if not completed:
+            self.lost = True
+        return completed
+
+    def release(self) -> None:
+        """Give up the claim and queue the VOD again."""
+        self.watcher.release(self.file_path, self.node)
+
+    def __enter__(self) -> "Lease":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat, name="lease", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if exc_type is not None:
+            self.release()
+
+    # -- Private methods --
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.duration / 3):
+            try:
+                renewed: bool = self.watcher.renew(self.file_path, self.node, self.duration)
+            except Exception as e:
+                # Retried on the next beat, the lease is still valid for a while
+                log.warning(f"Could not renew the lease on {self.file_path}: {e}")
+                continue
+            if not renewed:
+                self.lost = True
+                log.warning(f"Lost the lease on {self.file_path} to another node")
+                return
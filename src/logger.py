@@ -1,5 +1,17 @@
+import atexit
+import gzip
+import json
 import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
 from logging import Logger
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Optional
 
 from config import settings
 from constants import LOG_DIR
@@ -7,6 +19,8 @@ from constants import LOG_DIR
 __all__ = ["get_logger", "Logger"]
 
 LOG_FILE = LOG_DIR / "app.log"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 # Create the log directory if it doesn't exist
 LOG_DIR.mkdir(exist_ok=True)
@@ -17,16 +31,182 @@ def get_log_level(level_str: str) -> int:
     return getattr(logging, level_str.upper(), logging.INFO)
 
 
-# Configure the logger
-logging.basicConfig(
-    level=get_log_level(settings.log_level),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=[
-        # logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ],
-)
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Drops repetitive messages, e.g. upload progress.
+
+    Only messages logged with `extra={"rate_limit": True}` are limited, per
+    call site: at most `rate` of them pass per `per` seconds, the next one
+    that passes tells how many were dropped. Warnings and errors are never
+    dropped.
+    """
+
+    def __init__(self, rate: int, per: float = 60.0, max_keys: int = 1000) -> None:
+        super().__init__()
+        self.rate: int = rate
+        self.per: float = per
+        self.max_keys: int = max_keys
+        # call site -> [window start, messages passed, messages dropped]
+        self._windows: dict[tuple[str, int, str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if (
+            self.rate <= 0
+            or record.levelno >= logging.WARNING
+            or not getattr(record, "rate_limit", False)
+        ):
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno)
+        now: float = time.monotonic()
+        with self._lock:
+            window: Optional[list] = self._windows.get(key)
+            if window is None or now - window[0] >= self.per:
+                dropped: int = window[2] if window is not None else 0
+                if len(self._windows) >= self.max_keys:
+                    self._expire(now)
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.rate:
+                window[1] += 1
+                return True
+            else:
+                window[2] += 1
+                return False
+
+        if dropped:
+            record.msg = f"{record.getMessage()} ({dropped} similar messages suppressed)"
+            record.args = None
+        return True
+
+    def _expire(self, now: float) -> None:
+        for key, window in list(self._windows.items()):
+            if now - window[0] >= self.per:
+                del self._windows[key]
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """Rotates the log file when it reaches `max_bytes` or every `interval`
+    seconds, whichever comes first, and optionally gzips the rotated files.
+
+    The time of the last rotation is kept in a file next to the log, so
+    the schedule survives restarts.
+    """
+
+    def __init__(
+        self,
+        filename: Path,
+        max_bytes: int,
+        backup_count: int,
+        interval: float = 0.0,
+        compress: bool = True,
+    ) -> None:
+        super().__init__(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+        )
+        self.interval: float = interval
+        self.rollover_at: float = self._next_rollover()
+        if compress:
+            self.namer = lambda name: f"{name}.gz"
+            self.rotator = _gzip
+
+    @property
+    def schedule_file(self) -> Path:
+        """Returns the file holding the time of the last rotation"""
+        return Path(f"{self.baseFilename}.rollover")
+
+    def _next_rollover(self) -> float:
+        if self.interval <= 0:
+            return float("inf")
+        # Neither the ctime (inode change on Linux) nor the creation time
+        # (carried over by NTFS tunneling on Windows) of the log can be used
+        try:
+            start: float = float(self.schedule_file.read_text())
+        except (OSError, ValueError):
+            start = self._mark_rollover()
+        return start + self.interval
+
+    def _mark_rollover(self) -> float:
+        now: float = time.time()
+        try:
+            self.schedule_file.write_text(f"{now}\n")
+        except OSError:
+            pass
+        return now
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if time.time() >= self.rollover_at and os.path.isfile(self.baseFilename):
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        if self.interval > 0:
+            self.rollover_at = self._mark_rollover() + self.interval
+
+
+def _gzip(source: str, destination: str) -> None:
+    with open(source, "rb") as f_in, gzip.open(destination, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _configure() -> QueueListener:
+    """Send every record through a queue to handlers running on a
+    background thread, so logging never waits on the console or disk.
+
+    Returns:
+        QueueListener: The started listener.
+    """
+    config = settings.logging
+    formatter: logging.Formatter = (
+        JsonFormatter() if config.json_lines else logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+    )
+    handlers: list[logging.Handler] = [logging.StreamHandler()]
+    if config.file:
+        handlers.append(
+            CompressingRotatingFileHandler(
+                LOG_FILE,
+                max_bytes=config.max_bytes,
+                backup_count=config.backup_count,
+                interval=config.rotate_every_hours * 3600,
+                compress=config.compress,
+            )
+        )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(config.rate_limit, config.rate_limit_seconds))
+
+    root: logging.Logger = logging.getLogger()
+    root.setLevel(get_log_level(settings.log_level))
+    root.addHandler(queue_handler)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Write out whatever is still queued on exit
+    atexit.register(listener.stop)
+    return listener
+
+
+listener: QueueListener = _configure()
 
 
 def get_logger(name: str) -> logging.Logger:
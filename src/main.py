@@ -1,59 +1,221 @@
+import argparse
+from datetime import datetime, timedelta
+from functools import partial
+from typing import TYPE_CHECKING, Optional
+
+from backfill import backfill
 from config import settings
 from constants import *  # noqa: F403
+from lease import Lease, sync_clock
 from logger import Logger, get_logger
+from maintenance import Maintenance
+from quota import QuotaExceededError, pacific_now
+from retention import Retention
 from uploaders import UploaderProtocol, get_uploader
 from video import Video
 from watcher import FileWatcher
 
+if TYPE_CHECKING:
+    from uploaders.post_upload import PostUploadQueue
+
 log: Logger = get_logger(__name__)
 
 
-def upload_video(video: Video, uploader: UploaderProtocol) -> None:
+def upload_video(video: Video, uploader: UploaderProtocol) -> str:
     """Upload a single video to YouTube.
 
     Args:
         video (Video): The video to upload.
         uploader (UploaderProtocol): Uploads videos to YouTube.
+
+    Returns:
+        str: The id of the uploaded video.
     """
 
     log.info(f"Uploading video: {video.title}")
 
     try:
-        uploader.upload_video(
+        return uploader.upload_video(
             file_path=str(video.file),
             title=video.title,
             description=video.description,
             tags=video.tags,
         )
 
+    except QuotaExceededError:
+        raise
+
     except Exception as e:
         log.error(f"Failed to upload video: {video.title}")
         log.exception(e)
         raise e
 
 
+def start_post_upload(watcher: FileWatcher) -> Optional["PostUploadQueue"]:
+    """Start the post-upload stage if YouTube is the primary uploader
+    and playlists or processing status tracking are configured.
+    """
+    names: list[str] = (
+        settings.uploader if isinstance(settings.uploader, list) else [settings.uploader]
+    )
+    if names[0] != "youtube" or not (
+        settings.youtube.playlists or settings.youtube.track_processing
+    ):
+        return None
+
+    from uploaders.post_upload import PostUploadQueue
+
+    post_upload = PostUploadQueue(
+        get_uploader("youtube"),
+        watcher,
+        track_processing=settings.youtube.track_processing,
+    )
+    post_upload.start()
+    return post_upload
+
+
+def handle_upload(
+    video: Video,
+    uploader: UploaderProtocol,
+    watcher: FileWatcher,
+    retention: Retention,
+    post_upload: Optional["PostUploadQueue"],
+) -> Optional[str]:
+    """Claim a valid video, upload it and run everything that follows an upload.
+
+    Returns:
+        Optional[str]: The id of the uploaded video, or None if another
+            node claimed it first or took the claim over during the upload.
+
+    Raises:
+        QuotaExceededError: If the YouTube quota is exhausted, the video
+            is queued again.
+    """
+    lease = Lease(watcher, str(video.file))
+    if not lease.acquire():
+        log.debug(f"Video claimed by another node: {video.title}")
+        return None
+    try:
+        with lease:
+            video_id: str = upload_video(video, uploader)
+            if not lease.complete(video_id, uploader.last_digest):
+                # Keep the record of the node that holds the claim
+                log.error(
+                    f"Lost the claim on {video.title} during the upload, "
+                    f"it may have been uploaded twice. Duplicate video id: {video_id}"
+                )
+                return None
+    except QuotaExceededError as e:
+        # Leaving the lease released the claim
+        log.warning(
+            f"YouTube quota exhausted, {video.title} stays queued "
+            f"until {e.resets_at:%Y-%m-%d %H:%M %Z}"
+        )
+        raise
+    if post_upload is not None:
+        post_upload.enqueue(video_id, video.playlist_ids)
+    if settings.retention.enabled:
+        retention.enforce()
+    return video_id
+
+
 def run() -> None:
     """Run the main loop of the program."""
     uploader: UploaderProtocol = get_uploader(settings.uploader)
     watcher = FileWatcher()
-    for i, file in enumerate(watcher.start_watching()):
-        video = Video(file)
-        log.debug(f"({i}) Found new video: {video.title}")
+    sync_clock(watcher)
+    retention = Retention(watcher)
+    post_upload = start_post_upload(watcher)
+    maintenance = Maintenance(watcher)
+    maintenance.start()
+    quota_resets_at: Optional[datetime] = None
+    try:
+        for i, file in enumerate(watcher.start_watching()):
+            video = Video(file)
+            log.debug(f"({i}) Found new video: {video.title}")
+
+            if not video.is_valid():
+                log.debug(f"Video not valid: {video.title}")
+                continue
+
+            if quota_resets_at is not None and pacific_now() < quota_resets_at:
+                # Untracked, so it is found again by the first scan after the reset
+                log.debug(f"Upload deferred until the YouTube quota resets: {video.title}")
+                continue
+
+            try:
+                handle_upload(video, uploader, watcher, retention, post_upload)
+            except QuotaExceededError as e:
+                # Give the quota a minute of slack to actually reset
+                quota_resets_at = e.resets_at + timedelta(minutes=1)
+        else:
+            log.info("No new videos found")
+    finally:
+        # Also on Ctrl+C: a last post-upload flush, then commit pending writes
+        maintenance.stop()
+        if post_upload is not None:
+            post_upload.stop()
+        watcher.close()
+
+
+def run_backfill(dry_run: bool = False, workers: int = 16) -> None:
+    """Queue the whole directory in bulk, upload the queue once and exit."""
+    watcher = FileWatcher()
+    if dry_run:
+        backfill(watcher, None, dry_run=True, workers=workers)
+        return
+
+    uploader: UploaderProtocol = get_uploader(settings.uploader)
+    sync_clock(watcher)
+    retention = Retention(watcher)
+    post_upload = start_post_upload(watcher)
+    handle = partial(
+        handle_upload,
+        uploader=uploader,
+        watcher=watcher,
+        retention=retention,
+        post_upload=post_upload,
+    )
+    try:
+        backfill(watcher, handle, workers=workers)
+    finally:
+        if post_upload is not None:
+            post_upload.stop()
 
-        if not video.is_valid():
-            log.debug(f"Video not valid: {video.title}")
-            continue
 
-        upload_video(video, uploader)
-        watcher.start_tracking(str(video.file))
-    else:
-        log.info("No new videos found")
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Uploads WarcraftRecorder VODs to YouTube.")
+    parser.add_argument(
+        "--backfill",
+        "--once",
+        action="store_true",
+        help="upload every untracked VOD in the directory once, then exit",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="with --backfill, only report what would be uploaded",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help="threads validating files in parallel during a backfill (default: 16)",
+    )
+    args = parser.parse_args(argv)
+    if args.dry_run and not args.backfill:
+        parser.error("--dry-run requires --backfill")
+    return args
 
 
-def main() -> None:
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
     log.info("Starting the World of Warcraft VOD uploader...")
     try:
-        run()
+        if args.backfill:
+            run_backfill(dry_run=args.dry_run, workers=args.workers)
+        else:
+            run()
     except KeyboardInterrupt:
         log.info("Shutting down the World of Warcraft VOD uploader...")
         exit()
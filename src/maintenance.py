@@ -0,0 +1,320 @@
+"""Maintenance of the tracking database: archival of old uploads,
+export/import and VACUUM/ANALYZE.
+
+    python src/maintenance.py export uploads.jsonl
+    python src/maintenance.py import known_uploads.csv
+    python src/maintenance.py archive --older-than-days 90
+    python src/maintenance.py optimize
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from config import settings
+from logger import Logger, get_logger
+from watcher import BULK_SIZE, COLUMNS, FileWatcher
+
+log: Logger = get_logger(__name__)
+
+# Columns exported and imported, ids are local to each database
+EXPORT_COLUMNS: list[str] = ["file_path", *COLUMNS]
+
+
+@dataclass
+class OperationStats:
+    operation: str
+    rows: int = 0
+    seconds: float = 0.0
+    # Size of the database file before and after, for VACUUM
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    def __str__(self) -> str:
+        text: str = f"{self.operation}: {self.rows} rows in {self.seconds:.2f}s"
+        if self.rows and self.seconds:
+            text += f" ({self.rows / self.seconds:.0f} rows/s)"
+        if self.bytes_before:
+            text += f", {self.bytes_before / 1024**2:.1f} MB -> {self.bytes_after / 1024**2:.1f} MB"
+        return text
+
+
+def _format(path: Path) -> str:
+    return "csv" if path.suffix.lower() == ".csv" else "jsonl"
+
+
+class Maintenance:
+    """Keeps the tracking table of a FileWatcher small and healthy.
+
+    Each operation is timed and its last run is recorded in the database,
+    so the schedule survives restarts.
+    """
+
+    table_name: str = "maintenance"
+
+    def __init__(
+        self,
+        watcher: FileWatcher,
+        archive_after_days: int = settings.maintenance.archive_after_days,
+        analyze_every_hours: float = settings.maintenance.analyze_every_hours,
+        vacuum_every_hours: float = settings.maintenance.vacuum_every_hours,
+        check_interval: float = 3600.0,
+    ) -> None:
+        self.watcher: FileWatcher = watcher
+        self.archive_after_days: int = archive_after_days
+        self.analyze_every_hours: float = analyze_every_hours
+        self.vacuum_every_hours: float = vacuum_every_hours
+        self.check_interval: float = check_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._create_table()
+
+    # -- Private methods --
+    def _create_table(self) -> None:
+        """Create the table if it does not exist."""
+        self.watcher.db.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                operation TEXT PRIMARY KEY,
+                last_run REAL,
+                rows INTEGER,
+                seconds REAL
+            )
+        """
+        )
+
+    def _record(self, stats: OperationStats) -> OperationStats:
+        self.watcher.db.execute(
+            f"INSERT OR REPLACE INTO {self.table_name} VALUES (?, ?, ?, ?)",
+            (stats.operation, time.time(), stats.rows, stats.seconds),
+        )
+        log.info(f"Database maintenance, {stats}")
+        return stats
+
+    def _size(self) -> int:
+        try:
+            return os.path.getsize(self.watcher.db_path)
+        except OSError:
+            return 0
+
+    # -- Operations --
+    def archive(self, older_than_days: Optional[int] = None) -> OperationStats:
+        """Move uploads older than `older_than_days` to the archive table.
+
+        Archived files still count as uploaded.
+        """
+        days: int = self.archive_after_days if older_than_days is None else older_than_days
+        table, archive = self.watcher.table_name, self.watcher.archive_table
+        # Ids are not copied: SQLite reuses them once the newest rows are gone
+        columns: str = ", ".join(EXPORT_COLUMNS)
+        updates: str = ", ".join(f"{column} = excluded.{column}" for column in COLUMNS)
+        # Rows from before uploaded_at was recorded are old by definition
+        where: str = (
+            "status = 'uploaded' AND "
+            "(uploaded_at IS NULL OR uploaded_at < datetime('now', ?))"
+        )
+        cutoff: str = f"-{days} days"
+
+        def move(conn: sqlite3.Connection) -> int:
+            conn.execute(
+                f"INSERT INTO {archive} ({columns}) "
+                f"SELECT {columns} FROM {table} WHERE {where} ORDER BY id "
+                f"ON CONFLICT(file_path) DO UPDATE SET {updates}",
+                (cutoff,),
+            )
+            return conn.execute(f"DELETE FROM {table} WHERE {where}", (cutoff,)).rowcount
+
+        start: float = time.perf_counter()
+        rows: int = self.watcher.db.submit(move)
+        return self._record(OperationStats("archive", rows, time.perf_counter() - start))
+
+    def export_rows(self, destination: Path, archived: bool = False) -> OperationStats:
+        """Stream the tracking table to a CSV or JSON lines file,
+        depending on its suffix.
+
+        Args:
+            destination (Path): The file to write.
+            archived (bool): Export the archive table instead.
+        """
+        table: str = self.watcher.archive_table if archived else self.watcher.table_name
+        start: float = time.perf_counter()
+        rows: int = 0
+        cursor = self.watcher.conn.execute(
+            f"SELECT {', '.join(EXPORT_COLUMNS)} FROM {table} ORDER BY id"
+        )
+        with open(destination, "w", newline="", encoding="utf-8") as f:
+            if _format(destination) == "csv":
+                writer = csv.writer(f)
+                writer.writerow(EXPORT_COLUMNS)
+                while batch := cursor.fetchmany(BULK_SIZE):
+                    writer.writerows(batch)
+                    rows += len(batch)
+            else:
+                while batch := cursor.fetchmany(BULK_SIZE):
+                    f.writelines(
+                        json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in batch
+                    )
+                    rows += len(batch)
+        return self._record(OperationStats("export", rows, time.perf_counter() - start))
+
+    def import_rows(self, source: Path) -> OperationStats:
+        """Load rows from a CSV or JSON lines file in bulk, e.g. a previous
+        export or a list of known uploads with only a file_path column.
+
+        Files that are already tracked are left alone.
+        """
+        placeholders: str = ", ".join("?" for _ in EXPORT_COLUMNS)
+        sql: str = (
+            f"INSERT INTO {self.watcher.table_name} ({', '.join(EXPORT_COLUMNS)}) "
+            f"VALUES ({placeholders}) ON CONFLICT(file_path) DO NOTHING"
+        )
+        start: float = time.perf_counter()
+        rows: int = 0
+        batch: list[tuple] = []
+        for record in self._read(source):
+            batch.append(self._row(record))
+            if len(batch) >= BULK_SIZE:
+                rows += self.watcher.db.executemany(sql, batch)
+                batch = []
+        if batch:
+            rows += self.watcher.db.executemany(sql, batch)
+        return self._record(OperationStats("import", rows, time.perf_counter() - start))
+
+    @staticmethod
+    def _read(source: Path) -> Iterator[dict[str, Any]]:
+        with open(source, newline="", encoding="utf-8") as f:
+            if _format(source) == "csv":
+                yield from csv.DictReader(f)
+            else:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    @staticmethod
+    def _row(record: dict[str, Any]) -> tuple:
+        if not record.get("file_path"):
+            raise ValueError(f"Row without a file_path: {record}")
+        values: dict[str, Any] = {
+            column: None if record.get(column) == "" else record.get(column)
+            for column in EXPORT_COLUMNS
+        }
+        values["status"] = values["status"] or "uploaded"
+        return tuple(values.values())
+
+    def analyze(self) -> OperationStats:
+        """Refresh the statistics of the query planner."""
+        start: float = time.perf_counter()
+        self.watcher.db.execute("ANALYZE")
+        return self._record(OperationStats("analyze", seconds=time.perf_counter() - start))
+
+    def vacuum(self) -> OperationStats:
+        """Rebuild the database file to give the space of deleted rows back."""
+        before: int = self._size()
+        start: float = time.perf_counter()
+        self.watcher.db.submit(lambda conn: conn.execute("VACUUM"), transaction=False)
+        stats = OperationStats(
+            "vacuum",
+            seconds=time.perf_counter() - start,
+            bytes_before=before,
+            bytes_after=self._size(),
+        )
+        return self._record(stats)
+
+    # -- Schedule --
+    def last_run(self, operation: str) -> Optional[float]:
+        """Returns the time of the last run of an operation, as a timestamp"""
+        row = self.watcher.conn.execute(
+            f"SELECT last_run FROM {self.table_name} WHERE operation = ?", (operation,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _is_due(self, operation: str, every_hours: float) -> bool:
+        if every_hours <= 0:
+            return False
+        last_run: Optional[float] = self.last_run(operation)
+        return last_run is None or time.time() - last_run >= every_hours * 3600
+
+    def run_due(self) -> list[OperationStats]:
+        """Run the operations whose time has come: archival once a day,
+        then ANALYZE and VACUUM at their configured intervals.
+        """
+        done: list[OperationStats] = []
+        if self.archive_after_days > 0 and self._is_due("archive", 24):
+            done.append(self.archive())
+        if self._is_due("analyze", self.analyze_every_hours):
+            done.append(self.analyze())
+        if self._is_due("vacuum", self.vacuum_every_hours):
+            done.append(self.vacuum())
+        return done
+
+    def start(self) -> None:
+        """Run the due operations every `check_interval` seconds on a background thread."""
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.run_due()
+            except Exception as e:
+                log.error("Database maintenance failed")
+                log.exception(e)
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Maintains the VOD tracking database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    archive = commands.add_parser("archive", help="move old uploads to the archive table")
+    archive.add_argument(
+        "--older-than-days",
+        type=int,
+        default=None,
+        help="defaults to maintenance.archive_after_days",
+    )
+
+    export = commands.add_parser("export", help="write the table to a .csv or .jsonl file")
+    export.add_argument("path", type=Path)
+    export.add_argument("--archived", action="store_true", help="export the archive table")
+
+    load = commands.add_parser("import", help="load a .csv or .jsonl file")
+    load.add_argument("path", type=Path)
+
+    optimize = commands.add_parser("optimize", help="run ANALYZE and VACUUM")
+    optimize.add_argument("--no-vacuum", action="store_true", help="only run ANALYZE")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    watcher = FileWatcher()
+    maintenance = Maintenance(watcher)
+    try:
+        if args.command == "archive":
+            maintenance.archive(args.older_than_days)
+        elif args.command == "export":
+            maintenance.export_rows(args.path, archived=args.archived)
+        elif args.command == "import":
+            maintenance.import_rows(args.path)
+        else:
+            maintenance.analyze()
+            if not args.no_vacuum:
+                maintenance.vacuum()
+    finally:
+        watcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import struct
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+__all__ = ["ISO_SUFFIXES", "Mp4Error", "Mp4Info", "probe"]
+
+# Files in the ISO base media file format
+ISO_SUFFIXES = {".mp4", ".m4v", ".mov"}
+# Boxes an ISO media file may start with
+FIRST_BOXES = {b"ftyp", b"styp", b"free", b"skip", b"wide", b"mdat", b"moov", b"pnot"}
+
+HEADER = struct.Struct(">I4s")
+LARGE_SIZE = struct.Struct(">Q")
+
+
+class Mp4Error(ValueError):
+    """Raised for truncated or corrupt files."""
+
+
+@dataclass(frozen=True)
+class Mp4Info:
+    # False while the recorder is still writing: the moov box comes last
+    has_moov: bool = False
+    # In seconds
+    duration: float = 0.0
+    width: int = 0
+    height: int = 0
+
+    @property
+    def resolution(self) -> Optional[str]:
+        """Returns the resolution of the video track, e.g. '1920x1080'"""
+        return f"{self.width}x{self.height}" if self.width and self.height else None
+
+
+def probe(file: Path) -> Mp4Info:
+    """Read the duration and resolution of an MP4 from its moov box.
+
+    Only box headers and the mvhd/tkhd boxes are read, the media data is
+    skipped with seeks. Results are cached by inode, size and mtime.
+
+    Raises:
+        OSError: If the file cannot be read.
+        Mp4Error: If the file is truncated or not an ISO media file.
+    """
+    stat: os.stat_result = os.stat(file)
+    result = _probe(str(file), stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if isinstance(result, str):
+        # A new exception each time, a cached one would keep every traceback alive
+        raise Mp4Error(result)
+    return result
+
+
+@lru_cache(maxsize=4096)
+def _probe(file: str, device: int, inode: int, size: int, mtime_ns: int) -> Mp4Info | str:
+    """Returns the info of the file, or the message of the Mp4Error it raised"""
+    # The stat fields are only part of the cache key
+    try:
+        with open(file, "rb") as f:
+            return _parse(f, size)
+    except Mp4Error as e:
+        return str(e)
+
+
+def _parse(f: BinaryIO, size: int) -> Mp4Info:
+    info = Mp4Info()
+    for i, (kind, start, end) in enumerate(_boxes(f, 0, size)):
+        if i == 0 and kind not in FIRST_BOXES:
+            raise Mp4Error(f"Not an ISO media file, starts with {kind!r}")
+        if kind == b"moov":
+            info = _parse_moov(f, start, end)
+    return info
+
+
+def _boxes(f: BinaryIO, start: int, end: int) -> Iterator[tuple[bytes, int, int]]:
+    """Yield the (type, payload start, end) of the boxes between two offsets."""
+    offset: int = start
+    while offset < end:
+        f.seek(offset)
+        header: bytes = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise Mp4Error(f"Truncated box header at {offset}")
+        size, kind = HEADER.unpack(header)
+        payload: int = offset + HEADER.size
+        if size == 1:
+            large: bytes = f.read(LARGE_SIZE.size)
+            if len(large) < LARGE_SIZE.size:
+                raise Mp4Error(f"Truncated box header at {offset}")
+            size = LARGE_SIZE.unpack(large)[0]
+            payload += LARGE_SIZE.size
+        if size == 0:
+            # The box extends to the end of its parent, e.g. media data still being written
+            size = end - offset
+        if size < payload - offset:
+            raise Mp4Error(f"Invalid size {size} of {kind!r} box at {offset}")
+        if offset + size > end:
+            raise Mp4Error(f"{kind!r} box at {offset} is truncated")
+        yield kind, payload, offset + size
+        offset += size
+
+
+def _read(f: BinaryIO, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    data: bytes = f.read(size)
+    if len(data) < size:
+        raise Mp4Error(f"Truncated box at {offset}")
+    return data
+
+
+def _parse_moov(f: BinaryIO, start: int, end: int) -> Mp4Info:
+    duration: float = 0.0
+    width: int = 0
+    height: int = 0
+    for kind, payload, box_end in _boxes(f, start, end):
+        if kind == b"mvhd":
+            version: int = _read(f, payload, 1)[0]
+            if version == 1:
+                timescale, length = struct.unpack(">IQ", _read(f, payload + 20, 12))
+            else:
+                timescale, length = struct.unpack(">II", _read(f, payload + 12, 8))
+            duration = length / timescale if timescale else 0.0
+        elif kind == b"trak":
+            for child, child_payload, child_end in _boxes(f, payload, box_end):
+                if child == b"tkhd":
+                    if child_end - child_payload < 84:
+                        raise Mp4Error(f"Invalid tkhd box at {child_payload}")
+                    # Width and height close the box, as 16.16 fixed point
+                    track_width, track_height = (
+                        value >> 16 for value in struct.unpack(">II", _read(f, child_end - 8, 8))
+                    )
+                    # Audio tracks have no size, keep the largest video track
+                    if track_width * track_height > width * height:
+                        width, height = track_width, track_height
+    return Mp4Info(has_moov=True, duration=duration, width=width, height=height)
+
+
+# -- Writing, for the recorder simulation and tests --
+def box(kind: bytes, payload: bytes) -> bytes:
+    """Returns a box with its header"""
+    return HEADER.pack(HEADER.size + len(payload), kind) + payload
+
+
+FTYP: bytes = box(b"ftyp", b"isom" + struct.pack(">I", 512) + b"isomiso2avc1mp41")
+
+
+def moov_box(duration: float, width: int, height: int, timescale: int = 1000) -> bytes:
+    """Returns a minimal moov box with one video track."""
+    length: int = round(duration * timescale)
+    mvhd: bytes = box(b"mvhd", bytes(4) + struct.pack(">IIII", 0, 0, timescale, length) + bytes(80))
+    tkhd: bytes = box(
+        b"tkhd",
+        bytes(4)
+        + struct.pack(">IIIII", 0, 0, 1, 0, length)
+        + bytes(52)
+        + struct.pack(">II", width << 16, height << 16),
+    )
+    return box(b"moov", mvhd + box(b"trak", tkhd))
@@ -0,0 +1,147 @@
+import sqlite3
+from datetime import datetime, time, timedelta, timezone, tzinfo
+from pathlib import Path
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from config import settings
+from database import Database, connect
+from logger import Logger, get_logger
+
+log: Logger = get_logger(__name__)
+
+try:
+    # The YouTube Data API quota resets at midnight Pacific time
+    PACIFIC: tzinfo = ZoneInfo("America/Los_Angeles")
+except ZoneInfoNotFoundError:
+    # No tz database (e.g. Windows without the tzdata package), ignore DST
+    log.warning("Time zone data not found, assuming UTC-8 for the YouTube quota")
+    PACIFIC = timezone(timedelta(hours=-8), "PST")
+
+
+def pacific_now() -> datetime:
+    """Returns the current time in the YouTube quota time zone"""
+    return datetime.now(PACIFIC)
+
+
+class QuotaExceededError(Exception):
+    """Raised when an API call would exceed today's quota."""
+
+    def __init__(self, call: str, resets_at: datetime) -> None:
+        super().__init__(f"YouTube API quota exhausted for {call}, resets at {resets_at}")
+        self.call: str = call
+        self.resets_at: datetime = resets_at
+
+
+class QuotaTracker:
+    """Keeps track of the YouTube Data API quota units spent per
+    Pacific time day in the tracking database.
+    """
+
+    table_name: str = "youtube_quota"
+
+    def __init__(
+        self,
+        db_path: Path = settings.database.path,
+        daily_limit: int = settings.youtube_quota.daily_limit,
+        costs: Optional[dict[str, int]] = None,
+    ) -> None:
+        self.db_path: Path = db_path
+        self.daily_limit: int = daily_limit
+        self.costs: dict[str, int] = (
+            costs if costs is not None else dict(settings.youtube_quota.costs)
+        )
+        self.db: Database = connect(self.db_path)
+        self._create_table()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Returns the read connection of the calling thread"""
+        return self.db.reader
+
+    # -- Private methods --
+    def _create_table(self) -> None:
+        """Create the table if it does not exist."""
+        self.db.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                day TEXT,
+                call TEXT,
+                calls INTEGER NOT NULL DEFAULT 0,
+                units INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, call)
+            )
+        """
+        )
+
+    @staticmethod
+    def _today() -> str:
+        return pacific_now().date().isoformat()
+
+    # -- Accounting --
+    def cost(self, call: str) -> int:
+        """Get the units charged for an API call, e.g. 'videos.insert'.
+
+        Raises:
+            KeyError: If no cost is configured for the call.
+        """
+        return self.costs[call]
+
+    def spend(self, call: str, count: int = 1, units: Optional[int] = None) -> None:
+        """Record API calls against today's quota.
+
+        Args:
+            call (str): The API method, e.g. 'videos.insert'.
+            count (int): The number of calls made.
+            units (Optional[int]): Units spent, defaults to the configured cost.
+        """
+        if units is None:
+            units = self.cost(call) * count
+        self.db.execute(
+            f"""
+            INSERT INTO {self.table_name} (day, call, calls, units) VALUES (?, ?, ?, ?)
+            ON CONFLICT(day, call) DO UPDATE SET
+                calls = calls + excluded.calls,
+                units = units + excluded.units
+            """,
+            (self._today(), call, count, units),
+        )
+
+    def exhaust(self) -> None:
+        """Mark today's quota as used up, e.g. after the API reported quotaExceeded."""
+        remaining: int = self.remaining()
+        if remaining > 0:
+            self.spend("quotaExceeded", count=0, units=remaining)
+
+    def used(self) -> int:
+        """Returns the units spent today"""
+        cursor = self.conn.execute(
+            f"SELECT COALESCE(SUM(units), 0) FROM {self.table_name} WHERE day = ?",
+            (self._today(),),
+        )
+        return cursor.fetchone()[0]
+
+    def remaining(self) -> int:
+        """Returns the units left today"""
+        return max(self.daily_limit - self.used(), 0)
+
+    def can_afford(self, call: str, count: int = 1) -> bool:
+        return self.cost(call) * count <= self.remaining()
+
+    def remaining_uploads(self) -> int:
+        """Returns the number of videos that can still be uploaded today"""
+        return self.remaining() // self.cost("videos.insert")
+
+    def resets_at(self) -> datetime:
+        """Returns the next Pacific midnight"""
+        tomorrow = pacific_now().date() + timedelta(days=1)
+        return datetime.combine(tomorrow, time(), tzinfo=PACIFIC)
+
+    def check(self, call: str, count: int = 1) -> None:
+        """Make sure today's quota allows the call.
+
+        Raises:
+            QuotaExceededError: If the call would exceed today's quota.
+        """
+        if not self.can_afford(call, count):
+            raise QuotaExceededError(call, self.resets_at())
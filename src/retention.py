@@ -0,0 +1,69 @@
+import shutil
+from pathlib import Path
+
+from config import settings
+from logger import Logger, get_logger
+from watcher import FileWatcher
+
+log: Logger = get_logger(__name__)
+
+
+class Retention:
+    """Deletes uploaded VODs from the recorder directory, oldest upload first,
+    while its drive is above the configured usage threshold.
+
+    Only files with a confirmed upload in the tracking database are deleted.
+    Files with other hard links, e.g. in the archive directory, are kept:
+    deleting them would free no space.
+    """
+
+    def __init__(
+        self,
+        watcher: FileWatcher,
+        max_usage_percent: float = settings.retention.max_usage_percent,
+    ) -> None:
+        self.watcher: FileWatcher = watcher
+        self.max_usage_percent: float = max_usage_percent
+
+    def enforce(self) -> list[Path]:
+        """Delete uploaded files until the drive is below the threshold.
+
+        Returns:
+            list[Path]: The deleted files.
+        """
+        usage = shutil.disk_usage(self.watcher.directory)
+        used: int = usage.used
+        limit: float = usage.total * self.max_usage_percent / 100
+        if used <= limit:
+            return []
+
+        log.info(
+            f"Drive is {used / usage.total:.0%} full, reclaiming space "
+            f"(threshold {self.max_usage_percent:g}%)"
+        )
+        reclaimed: list[Path] = []
+        for file_path in self.watcher.reclaimable_files():
+            if used <= limit:
+                break
+            file = Path(file_path)
+            try:
+                stat = file.stat()
+                if stat.st_nlink > 1:
+                    log.debug(f"Uploaded VOD is hard linked elsewhere, keeping it: {file.name}")
+                    continue
+                size: int = stat.st_size
+                file.unlink()
+                used -= size
+                reclaimed.append(file)
+                log.info(f"Deleted uploaded VOD: {file.name} ({size / 1024**2:.0f} MB)")
+            except FileNotFoundError:
+                log.debug(f"Uploaded VOD already gone: {file.name}")
+            except OSError as e:
+                # e.g. the recorder still has the file open
+                log.warning(f"Could not delete {file.name}: {e}")
+                continue
+            self.watcher.mark_reclaimed(file_path)
+
+        if used > limit:
+            log.warning("No more uploaded VODs to delete, drive is still above the threshold")
+        return reclaimed
@@ -0,0 +1,365 @@
+"""Simulates WarcraftRecorder to measure the time from a boss kill to the
+finished upload, through the real FileWatcher -> Video -> uploader path.
+
+    python src/simulate.py --count 20 --rate 6 --burst 3 --size-mb 200 --upload-mbps 50
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import mp4
+from config import settings
+from logger import Logger, get_logger
+from main import handle_upload
+from retention import Retention
+from uploaders.fake import FakeUploader
+from video import Video
+from watcher import FileWatcher
+
+log: Logger = get_logger(__name__)
+
+DIFFICULTY_TAGS = {"Mythic": "[M]", "Heroic": "[HC]", "Normal": "[N]"}
+WRITE_SIZE = 1024 * 1024
+
+
+@dataclass
+class SimulationReport:
+    uploaded: int = 0
+    failed: int = 0
+    uploaded_bytes: int = 0
+    seconds: float = 0.0
+    timed_out: bool = False
+    # Seconds from the kill (the rename of the VOD) to the finished upload
+    latencies: list[float] = field(default_factory=list)
+    # (seconds since the start, VODs killed but not uploaded yet)
+    queue_depth: list[tuple[float, int]] = field(default_factory=list)
+
+    def percentile(self, percent: float) -> float:
+        """Returns a latency percentile in seconds (nearest rank)"""
+        if not self.latencies:
+            return 0.0
+        latencies: list[float] = sorted(self.latencies)
+        rank: int = max(math.ceil(len(latencies) * percent / 100) - 1, 0)
+        return latencies[rank]
+
+    @property
+    def uploads_per_minute(self) -> float:
+        return self.uploaded / self.seconds * 60 if self.seconds else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.uploaded_bytes / 1024**2 / self.seconds if self.seconds else 0.0
+
+    @property
+    def max_queue_depth(self) -> int:
+        return max((depth for _, depth in self.queue_depth), default=0)
+
+    def meets_slo(self, seconds: float, percent: float = 95.0) -> bool:
+        """Check that every VOD was uploaded and `percent` of them within `seconds`."""
+        return not self.timed_out and self.failed == 0 and self.percentile(percent) <= seconds
+
+    def __str__(self) -> str:
+        return (
+            f"{self.uploaded} uploaded, {self.failed} failed in {self.seconds:.1f}s"
+            f"{' (timed out)' if self.timed_out else ''}; "
+            f"latency p50 {self.percentile(50):.2f}s, p90 {self.percentile(90):.2f}s, "
+            f"p99 {self.percentile(99):.2f}s, max {self.percentile(100):.2f}s; "
+            f"{self.uploads_per_minute:.1f} uploads/min, {self.megabytes_per_second:.1f} MB/s; "
+            f"max queue depth {self.max_queue_depth}"
+        )
+
+
+class SyntheticRecorder:
+    """Writes VODs the way WarcraftRecorder does: each file grows while the
+    encounter is recorded and is renamed with its result when the boss dies.
+
+    Kills arrive in bursts of `burst` VODs (e.g. a raid clearing several
+    bosses back to back), the bursts as a Poisson process averaging `rate`
+    kills per minute.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        count: int = 10,
+        size_mb: float = 50.0,
+        rate: float = 6.0,
+        burst: int = 1,
+        write_seconds: float = 1.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.directory: Path = directory
+        self.count: int = count
+        self.size: int = int(size_mb * 1024 * 1024)
+        self.rate: float = rate
+        self.burst: int = max(burst, 1)
+        # How long the recorder takes to write a VOD
+        self.write_seconds: float = write_seconds
+        # Final path -> time.perf_counter() of the rename
+        self.killed_at: dict[str, float] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def killed(self) -> int:
+        with self._lock:
+            return len(self.killed_at)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self._thread.start()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def kill_time(self, file_path: str) -> Optional[float]:
+        with self._lock:
+            return self.killed_at.get(file_path)
+
+    # -- Private methods --
+    def _run(self) -> None:
+        recorded: int = 0
+        while recorded < self.count:
+            size: int = min(self.burst, self.count - recorded)
+            gap: float = self._random.expovariate(self.rate / 60 / size)
+            # The recording itself is part of the gap between two kills
+            time.sleep(max(gap - self.write_seconds, 0))
+            self._record([recorded + i + 1 for i in range(size)])
+            recorded += size
+
+    def _name(self, number: int) -> str:
+        difficulty: str = settings.warcraft.difficulties[0]
+        return (
+            f"{datetime.now():%Y-%m-%d %H-%M-%S} - Simulated - Boss {number} "
+            f"{DIFFICULTY_TAGS[difficulty]}"
+        )
+
+    def _record(self, numbers: list[int]) -> None:
+        """Grow the files of a burst together, then rename them as kills."""
+        suffix: str = settings.warcraft.file_types[0]
+        keyword: str = settings.warcraft.search_keywords[0]
+        names: list[str] = [self._name(number) for number in numbers]
+        recordings: list[Path] = [self.directory / f"{name}{suffix}" for name in names]
+        writes: int = max(math.ceil(self.size / WRITE_SIZE), 1)
+        files = [open(recording, "wb") for recording in recordings]
+        try:
+            for fd in files:
+                # The media data grows first, its size is filled in at the end
+                fd.write(mp4.FTYP + mp4.HEADER.pack(1, b"mdat") + mp4.LARGE_SIZE.pack(0))
+            for i in range(writes):
+                chunk: bytes = b"\0" * min(WRITE_SIZE, self.size - i * WRITE_SIZE)
+                for fd in files:
+                    fd.write(chunk)
+                    fd.flush()
+                time.sleep(self.write_seconds / writes)
+            for fd in files:
+                # Like the recorder, finish with the moov box
+                fd.seek(len(mp4.FTYP) + mp4.HEADER.size)
+                fd.write(mp4.LARGE_SIZE.pack(16 + self.size))
+                fd.seek(0, os.SEEK_END)
+                fd.write(mp4.moov_box(self.write_seconds, 1920, 1080))
+        finally:
+            for fd in files:
+                fd.close()
+
+        for name, recording in zip(names, recordings):
+            final: Path = self.directory / f"{name} ({keyword}){suffix}"
+            os.replace(recording, final)
+            with self._lock:
+                self.killed_at[str(final)] = time.perf_counter()
+            log.debug(f"Simulated kill: {final.name}")
+
+
+class Simulation:
+    """Runs a SyntheticRecorder against the watcher and an uploader and
+    measures each VOD from its kill to its finished upload.
+    """
+
+    def __init__(
+        self,
+        recorder: SyntheticRecorder,
+        uploader: Optional[FakeUploader] = None,
+        poll_interval: float = 1.0,
+        sample_interval: float = 0.5,
+    ) -> None:
+        self.recorder: SyntheticRecorder = recorder
+        self.uploader: FakeUploader = uploader if uploader is not None else FakeUploader()
+        self.poll_interval: float = poll_interval
+        self.sample_interval: float = sample_interval
+        self.report = SimulationReport()
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._stop = threading.Event()
+
+    def run(self, timeout: float = 600.0) -> SimulationReport:
+        """Record and upload every VOD, or give up after `timeout` seconds.
+
+        Returns:
+            SimulationReport: Latencies, throughput and queue depth over time.
+        """
+        directory: Path = self.recorder.directory
+        watcher = FileWatcher(directory=directory, db_path=directory / "simulation.db")
+        consumer = threading.Thread(
+            target=self._consume, args=(watcher,), name="consumer", daemon=True
+        )
+        start: float = time.perf_counter()
+        self.recorder.start()
+        consumer.start()
+
+        while not self._finished.wait(self.sample_interval):
+            elapsed: float = time.perf_counter() - start
+            self._sample(elapsed)
+            if elapsed >= timeout:
+                log.warning(f"Simulation timed out after {timeout:g}s")
+                self.report.timed_out = True
+                break
+        self.report.seconds = time.perf_counter() - start
+        self._sample(self.report.seconds)
+
+        self._stop.set()
+        consumer.join(self.poll_interval + 1)
+        self.recorder.join(1)
+        watcher.close()
+        return self.report
+
+    # -- Private methods --
+    def _sample(self, elapsed: float) -> None:
+        with self._lock:
+            done: int = self.report.uploaded + self.report.failed
+        self.report.queue_depth.append((elapsed, self.recorder.killed - done))
+
+    def _consume(self, watcher: FileWatcher) -> None:
+        """The main loop of the uploader, see main.run()."""
+        retention = Retention(watcher)
+        for file in watcher.start_watching(self.poll_interval):
+            if self._stop.is_set():
+                return
+            video = Video(file)
+            if not video.is_valid():
+                continue
+
+            try:
+                size: int = file.stat().st_size
+                if handle_upload(video, self.uploader, watcher, retention, None) is None:
+                    continue
+            except Exception as e:
+                log.error(f"Simulated upload failed for {video.title}: {e}")
+                # Do not retry it on the next scan
+                watcher.start_tracking(str(file))
+                self._done(str(file), failed=True)
+            else:
+                self._done(str(file), size=size)
+
+            if self._finished.is_set():
+                return
+
+    def _done(self, file_path: str, size: int = 0, failed: bool = False) -> None:
+        killed_at: Optional[float] = self.recorder.kill_time(file_path)
+        with self._lock:
+            if failed:
+                self.report.failed += 1
+            else:
+                self.report.uploaded += 1
+                self.report.uploaded_bytes += size
+                if killed_at is not None:
+                    self.report.latencies.append(time.perf_counter() - killed_at)
+            if self.report.uploaded + self.report.failed >= self.recorder.count:
+                self._finished.set()
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Measures the time from a boss kill to the finished upload "
+        "with a simulated WarcraftRecorder and a fake uploader."
+    )
+    parser.add_argument("--count", type=int, default=10, help="VODs to record (default: 10)")
+    parser.add_argument("--size-mb", type=float, default=50.0, help="size of each VOD (default: 50)")
+    parser.add_argument(
+        "--rate", type=float, default=6.0, help="average kills per minute (default: 6)"
+    )
+    parser.add_argument(
+        "--burst", type=int, default=1, help="VODs finished at the same time (default: 1)"
+    )
+    parser.add_argument(
+        "--write-seconds",
+        type=float,
+        default=1.0,
+        help="time the recorder takes to write a VOD (default: 1)",
+    )
+    parser.add_argument(
+        "--upload-mbps",
+        type=float,
+        default=None,
+        help="simulated upload bandwidth in MB/s (default: unlimited)",
+    )
+    parser.add_argument(
+        "--upload-latency",
+        type=float,
+        default=0.0,
+        help="simulated seconds per upload on top of the transfer (default: 0)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=15.0,
+        help="seconds between directory scans (default: 15, like the uploader)",
+    )
+    parser.add_argument("--slo", type=float, default=None, help="latency objective in seconds")
+    parser.add_argument(
+        "--slo-percentile", type=float, default=95.0, help="percentile held to --slo (default: 95)"
+    )
+    parser.add_argument("--timeout", type=float, default=600.0, help="give up after (default: 600)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the kill arrivals")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="wow_vod_simulation_") as directory:
+        recorder = SyntheticRecorder(
+            Path(directory),
+            count=args.count,
+            size_mb=args.size_mb,
+            rate=args.rate,
+            burst=args.burst,
+            write_seconds=args.write_seconds,
+            seed=args.seed,
+        )
+        uploader = FakeUploader(
+            bytes_per_second=args.upload_mbps * 1024**2 if args.upload_mbps else None,
+            latency=args.upload_latency,
+        )
+        simulation = Simulation(
+            recorder,
+            uploader,
+            poll_interval=args.poll_interval,
+            sample_interval=max(args.poll_interval / 4, 0.1),
+        )
+        report: SimulationReport = simulation.run(timeout=args.timeout)
+
+    for elapsed, depth in report.queue_depth:
+        log.info(f"t={elapsed:7.1f}s queue depth {depth}")
+    log.info(f"Simulation finished: {report}")
+
+    if args.slo is not None:
+        if report.meets_slo(args.slo, args.slo_percentile):
+            log.info(f"p{args.slo_percentile:g} latency within the {args.slo:g}s SLO")
+        else:
+            log.error(f"p{args.slo_percentile:g} latency misses the {args.slo:g}s SLO")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
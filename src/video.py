@@ -3,9 +3,10 @@ from dataclasses import dataclass as dc
 from datetime import datetime
 from logging import Logger, getLogger
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Optional
 
 from config import settings
+from mp4 import ISO_SUFFIXES, Mp4Error, Mp4Info, probe
 
 log: Logger = getLogger(__name__)
 
@@ -69,6 +70,73 @@ class Video:
 
         raise ValueError(f"Difficulty not found: {self.file.name}")
 
+    @property
+    def boss(self) -> str:
+        """Get the name of the boss
+
+        Returns:
+            str: {Boss}
+        """
+        name: str = self.file.stem.split(" - ")[-1]
+        # Remove [difficulty] and (Kill)
+        return re.sub(r"\[.*?\]|\(.*?\)", "", name).strip()
+
+    @property
+    def playlist_ids(self) -> list[str]:
+        """Get the YouTube playlists the video belongs in,
+        configured per difficulty and/or per boss
+
+        Returns:
+            list[str]: The ids of the playlists
+        """
+        playlists: dict[str, str] = settings.youtube.playlists
+        return [playlists[key] for key in (self.difficulty, self.boss) if key in playlists]
+
+    @property
+    def metadata(self) -> Optional[Mp4Info]:
+        """Get the metadata read from the MP4 boxes, without decoding the video
+
+        Returns:
+            Optional[Mp4Info]: None if the file is not an MP4 or cannot be read
+        """
+        if self.file.suffix.lower() not in ISO_SUFFIXES:
+            return None
+        try:
+            return probe(self.file)
+        except (OSError, Mp4Error) as e:
+            log.debug(f"Cannot read the MP4 metadata of {self.file.name}: {e}")
+            return None
+
+    @property
+    def has_moov(self) -> bool:
+        """Check if the MP4 is complete: the recorder writes the moov box last
+
+        Returns:
+            bool: False for truncated, corrupt or unfinished files
+        """
+        metadata: Optional[Mp4Info] = self.metadata
+        return metadata is not None and metadata.has_moov
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Get the length of the video
+
+        Returns:
+            Optional[float]: In seconds, None if unknown
+        """
+        metadata: Optional[Mp4Info] = self.metadata
+        return metadata.duration if metadata is not None and metadata.has_moov else None
+
+    @property
+    def resolution(self) -> Optional[str]:
+        """Get the resolution of the video
+
+        Returns:
+            Optional[str]: {width}x{height}, None if unknown
+        """
+        metadata: Optional[Mp4Info] = self.metadata
+        return metadata.resolution if metadata is not None else None
+
     @property
     def description(self) -> str:
         """Get the description for the YouTube video
@@ -76,6 +144,8 @@ class Video:
             - {difficulty}
             - {killed_at}
             - {killed_on}
+            - {duration}
+            - {resolution}
 
         Returns:
             str: Formatted description for the YouTube video
@@ -85,6 +155,8 @@ class Video:
             "difficulty": self.difficulty,
             "killed_at": self.killed_at,
             "killed_on": self.killed_on,
+            "duration": format_duration(self.duration),
+            "resolution": self.resolution or "unknown",
         }
 
         return unformatted_str.format_map(DynamicDict(supported_tags))
@@ -118,6 +190,7 @@ class Video:
                 (from the settings file)
             - The file name contains any of the keywords.
                 (from the settings file
+            - MP4 files are complete, not truncated or corrupt.
 
         Args:
             file (Path): Path object representing the file.
@@ -141,9 +214,26 @@ class Video:
         if self.difficulty not in settings.warcraft.difficulties:
             return False
 
+        # Check the MP4 is complete, the moov box is missing while recording
+        if self.file.suffix.lower() in ISO_SUFFIXES and not self.has_moov:
+            return False
+
         return True
 
 
+def format_duration(seconds: Optional[float]) -> str:
+    """Format a duration for descriptions
+
+    Returns:
+        str: h:mm:ss or m:ss, 'unknown' if None
+    """
+    if seconds is None:
+        return "unknown"
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+
 class DynamicDict(dict):
     """Helper class to provide default values for missing keys
 
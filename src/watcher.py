@@ -1,13 +1,38 @@
+import heapq
+import os
 import sqlite3
 import time
 from pathlib import Path
-from typing import Generator
+from typing import Generator, Optional
 
 from config import settings
+from database import Database, connect
 from logger import *
 
 log: Logger = get_logger(__name__)
 
+# Columns added after the original (id, file_path) schema.
+# Missing columns are added to existing tables on start-up.
+COLUMNS: dict[str, str] = {
+    "video_id": "TEXT",
+    "digest": "TEXT",
+    "uploaded_at": "TIMESTAMP",
+    "reclaimed_at": "TIMESTAMP",
+    "processing_status": "TEXT",
+    "playlists": "TEXT",
+    # 'queued' rows are waiting for a backfill upload,
+    # 'uploading' rows are claimed by a node until their lease expires
+    "status": "TEXT NOT NULL DEFAULT 'uploaded'",
+    "claimed_by": "TEXT",
+    "lease_expires": "REAL",
+}
+# Rows per executemany() transaction for bulk inserts
+BULK_SIZE = 10_000
+# Untracked files held in memory while a directory is scanned
+MAX_PENDING = 1024
+# Seconds a scan orders files before it yields the oldest one
+DISCOVERY_WINDOW = 1.0
+
 
 class FileWatcher:
     """Watches a directory for new files and uploads them to a service
@@ -24,24 +49,49 @@ class FileWatcher:
         self.db_path: Path = db_path
         # Set table name to the directory's path with underscores
         self.table_name: str = self._set_table_name()
-        self.conn = sqlite3.connect(self.db_path)
+        # Old uploads are moved here by maintenance to keep the table small
+        self.archive_table: str = f"{self.table_name}_archive"
+        # Seconds to add to this node's clock to get the shared lease clock, see lease.sync_clock
+        self.clock_offset: float = 0.0
+        self.db: Database = connect(self.db_path)
         self._create_table()
 
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Returns the read connection of the calling thread"""
+        return self.db.reader
+
+    def now(self) -> float:
+        """Returns the time on the clock lease expiries are compared with"""
+        return time.time() + self.clock_offset
+
     # -- Private methods --
     def _set_table_name(self) -> str:
         return "_".join(self.directory.parts[1:]).lower()
 
     def _create_table(self) -> None:
         """Create the table if it does not exist."""
-        with self.conn:
-            self.conn.execute(
-                f"""
-                CREATE TABLE IF NOT EXISTS {self.table_name} (
-                    id INTEGER PRIMARY KEY,
-                    file_path TEXT UNIQUE
+
+        def create(conn: sqlite3.Connection) -> None:
+            for table_name in (self.table_name, self.archive_table):
+                conn.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {table_name} (
+                        id INTEGER PRIMARY KEY,
+                        file_path TEXT UNIQUE
+                    )
+                """
                 )
-            """
-            )
+                existing: set[str] = {
+                    row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")
+                }
+                for column, column_type in COLUMNS.items():
+                    if column not in existing:
+                        conn.execute(
+                            f"ALTER TABLE {table_name} ADD COLUMN {column} {column_type}"
+                        )
+
+        self.db.submit(create)
 
     # -- DB methods --
     def is_tracked(self, file_path: str) -> bool:
@@ -54,22 +104,203 @@ class FileWatcher:
             bool: True if the file has been found before, False otherwise.
         """
         cursor = self.conn.execute(
-            f"SELECT 1 FROM {self.table_name} WHERE file_path = ?", (file_path,)
+            f"""
+            SELECT 1 FROM {self.table_name} WHERE file_path = ? AND status = 'uploaded'
+            UNION ALL
+            SELECT 1 FROM {self.archive_table} WHERE file_path = ?
+            """,
+            (file_path, file_path),
         )
         return cursor.fetchone() is not None
 
-    def start_tracking(self, file_path: str) -> None:
+    def tracked_files(self) -> set[str]:
+        """Get all files that have been found before in one query.
+
+        Returns:
+            set[str]: String representations of the file paths.
+        """
+        cursor = self.conn.execute(
+            f"""
+            SELECT file_path FROM {self.table_name} WHERE status = 'uploaded'
+            UNION ALL
+            SELECT file_path FROM {self.archive_table}
+            """
+        )
+        return {row[0] for row in cursor}
+
+    def enqueue_many(self, file_paths: list[str]) -> int:
+        """Queue files for upload in bulk, in large transactions.
+
+        Args:
+            file_paths (list[str]): String representations of the file paths.
+
+        Returns:
+            int: The number of files newly queued.
+        """
+        queued: int = 0
+        for start in range(0, len(file_paths), BULK_SIZE):
+            queued += self.db.executemany(
+                f"INSERT OR IGNORE INTO {self.table_name} (file_path, status) VALUES (?, 'queued')",
+                ((file_path,) for file_path in file_paths[start : start + BULK_SIZE]),
+            )
+        log.info(f"Queued {queued} files")
+        return queued
+
+    def queued_files(self) -> list[str]:
+        """Get the files waiting for a backfill upload, in queue order.
+
+        Returns:
+            list[str]: String representations of the file paths.
+        """
+        cursor = self.conn.execute(
+            f"SELECT file_path FROM {self.table_name} WHERE status = 'queued' ORDER BY id"
+        )
+        return [row[0] for row in cursor]
+
+    def start_tracking(
+        self,
+        file_path: str,
+        video_id: Optional[str] = None,
+        digest: Optional[str] = None,
+    ) -> None:
         """Add the file to the database.
 
         Args:
             file_path (str): String representation of the file path.
+            video_id (Optional[str]): The id returned by the uploader.
+            digest (Optional[str]): Checksum of the uploaded file.
         """
         log.info(f"Tracking file: {file_path}")
-        with self.conn:
-            self.conn.execute(
-                f"INSERT OR IGNORE INTO {self.table_name} (file_path) VALUES (?)",
-                (file_path,),
+        self.db.execute(
+            f"""
+            INSERT INTO {self.table_name} (file_path, video_id, digest, uploaded_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(file_path) DO UPDATE SET
+                video_id = COALESCE(excluded.video_id, video_id),
+                digest = COALESCE(excluded.digest, digest),
+                uploaded_at = COALESCE(uploaded_at, excluded.uploaded_at),
+                status = 'uploaded',
+                lease_expires = NULL
+            """,
+            (file_path, video_id, digest),
+        )
+
+    def claim(self, file_path: str, node: str, lease: float) -> bool:
+        """Atomically claim a file for upload, so only one node uploads it.
+
+        Succeeds for new and queued files, for files this node already
+        holds, and takes over files whose lease has expired.
+
+        Args:
+            file_path (str): String representation of the file path.
+            node (str): The name of the claiming node.
+            lease (float): Seconds the claim is valid without a renewal.
+
+        Returns:
+            bool: True if this node now holds the claim.
+        """
+        claimed: int = self.db.execute(
+            f"""
+            INSERT INTO {self.table_name} (file_path, status, claimed_by, lease_expires)
+            SELECT ?, 'uploading', ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM {self.archive_table} WHERE file_path = ?)
+            ON CONFLICT(file_path) DO UPDATE SET
+                status = 'uploading',
+                claimed_by = excluded.claimed_by,
+                lease_expires = excluded.lease_expires
+            WHERE status = 'queued' OR (
+                status = 'uploading'
+                AND (claimed_by = excluded.claimed_by OR lease_expires < ?)
             )
+            """,
+            (file_path, node, self.now() + lease, file_path, self.now()),
+        )
+        return claimed > 0
+
+    def renew(self, file_path: str, node: str, lease: float) -> bool:
+        """Extend the claim of a node on a file (heartbeat).
+
+        Returns:
+            bool: False if the claim was lost, e.g. taken over after it expired.
+        """
+        renewed: int = self.db.execute(
+            f"""
+            UPDATE {self.table_name} SET lease_expires = ?
+            WHERE file_path = ? AND claimed_by = ? AND status = 'uploading'
+            """,
+            (self.now() + lease, file_path, node),
+        )
+        return renewed > 0
+
+    def finish_upload(
+        self,
+        file_path: str,
+        node: str,
+        video_id: Optional[str] = None,
+        digest: Optional[str] = None,
+    ) -> bool:
+        """Record the upload of a file, if the node still holds its claim.
+
+        Args:
+            file_path (str): String representation of the file path.
+            node (str): The name of the node that uploaded the file.
+            video_id (Optional[str]): The id returned by the uploader.
+            digest (Optional[str]): Checksum of the uploaded file.
+
+        Returns:
+            bool: False if the claim was taken over, the row is left alone.
+        """
+        finished: int = self.db.execute(
+            f"""
+            UPDATE {self.table_name} SET
+                video_id = ?,
+                digest = ?,
+                uploaded_at = CURRENT_TIMESTAMP,
+                status = 'uploaded',
+                lease_expires = NULL
+            WHERE file_path = ? AND claimed_by = ? AND status = 'uploading'
+            """,
+            (video_id, digest, file_path, node),
+        )
+        if finished:
+            log.info(f"Tracking file: {file_path}")
+        return finished > 0
+
+    def release(self, file_path: str, node: str) -> bool:
+        """Give up the claim of a node on a file it did not upload,
+        queuing it for the next attempt.
+
+        Returns:
+            bool: False if the node did not hold the claim.
+        """
+        released: int = self.db.execute(
+            f"""
+            UPDATE {self.table_name} SET status = 'queued', claimed_by = NULL, lease_expires = NULL
+            WHERE file_path = ? AND claimed_by = ? AND status = 'uploading'
+            """,
+            (file_path, node),
+        )
+        return released > 0
+
+    def get_digest(self, file_path: str) -> Optional[str]:
+        """Get the checksum recorded for an uploaded file.
+
+        Args:
+            file_path (str): String representation of the file path.
+
+        Returns:
+            Optional[str]: The digest, or None if the file has none recorded.
+        """
+        cursor = self.conn.execute(
+            f"""
+            SELECT digest FROM {self.table_name} WHERE file_path = ?
+            UNION ALL
+            SELECT digest FROM {self.archive_table} WHERE file_path = ?
+            """,
+            (file_path, file_path),
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
 
     def stop_tracking(self, file_path: str) -> None:
         """Remove the file from the database.
@@ -78,29 +309,131 @@ class FileWatcher:
             file_path (str): String representation of the file path.
         """
         log.info(f"Stopping tracking for file: {file_path}")
-        with self.conn:
-            self.conn.execute(
-                f"DELETE FROM {self.table_name} WHERE file_path = ?", (file_path,)
+        self.db.execute(
+            f"DELETE FROM {self.table_name} WHERE file_path = ?", (file_path,)
+        )
+
+    def reclaimable_files(self) -> list[str]:
+        """Get the uploaded files that are still on disk, oldest upload first,
+        archived ones included.
+
+        Returns:
+            list[str]: String representations of the file paths.
+        """
+        cursor = self.conn.execute(
+            f"""
+            SELECT file_path FROM (
+                SELECT file_path, uploaded_at, 0 AS hot, id FROM {self.archive_table}
+                WHERE video_id IS NOT NULL AND reclaimed_at IS NULL
+                UNION ALL
+                SELECT file_path, uploaded_at, 1 AS hot, id FROM {self.table_name}
+                WHERE video_id IS NOT NULL AND reclaimed_at IS NULL
             )
+            ORDER BY uploaded_at, hot, id
+            """
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def mark_reclaimed(self, file_path: str) -> None:
+        """Record that an uploaded file was deleted from disk.
+
+        Args:
+            file_path (str): String representation of the file path.
+        """
+
+        def mark(conn: sqlite3.Connection) -> None:
+            for table in (self.table_name, self.archive_table):
+                conn.execute(
+                    f"UPDATE {table} SET reclaimed_at = CURRENT_TIMESTAMP WHERE file_path = ?",
+                    (file_path,),
+                )
+
+        self.db.submit(mark)
+
+    def set_processing_status(self, video_id: str, status: str) -> None:
+        """Record the processing status reported by YouTube.
+
+        Args:
+            video_id (str): The id of the uploaded video.
+            status (str): e.g. 'processing', 'succeeded' or 'failed'.
+        """
+        self.db.execute(
+            f"UPDATE {self.table_name} SET processing_status = ? WHERE video_id = ?",
+            (status, video_id),
+        )
+
+    def add_playlist(self, video_id: str, playlist_id: str) -> None:
+        """Record that the video was added to a playlist.
+
+        Args:
+            video_id (str): The id of the uploaded video.
+            playlist_id (str): The id of the playlist.
+        """
+        self.db.execute(
+            f"""
+            UPDATE {self.table_name}
+            SET playlists = COALESCE(playlists || ',', '') || ?
+            WHERE video_id = ?
+            """,
+            (playlist_id, video_id),
+        )
+
+    def close(self) -> None:
+        """Commit pending writes and close the database connections."""
+        self.db.close()
 
     # -- File methods --
-    def start_watching(self) -> Generator[Path, None, None]:
-        """Get all untracked files in the directory
-        sorted by creation data and yield them.
+    def start_watching(
+        self,
+        interval: float = 15.0,
+        max_pending: int = MAX_PENDING,
+        window: float = DISCOVERY_WINDOW,
+    ) -> Generator[Path, None, None]:
+        """Get all untracked files in the directory, oldest first,
+        and yield them. The directory is scanned again every `interval` seconds.
+
+        Args:
+            interval (float): Seconds to sleep between scans of the directory.
+            max_pending (int): Most files held in memory at once, see _discover.
+            window (float): Seconds to order files in before yielding one.
         """
         log.info(f"Watching for new files in {self.directory}")
-        current_files: set[Path] = sorted(
-            set(self.directory.iterdir()), key=lambda f: f.stat().st_mtime
-        )
         while True:
-            for file in current_files:
-                if self.is_tracked(str(file)):
+            yield from self._discover(max_pending, window)
+
+            log.debug(f"Tracking database: {self.db.stats()}")
+            log.info(f"Sleeping for {interval:g} seconds...", extra={"rate_limit": True})
+            time.sleep(interval)
+
+    def _discover(self, max_pending: int, window: float) -> Generator[Path, None, None]:
+        """Stream the untracked files of one directory scan.
+
+        Only untracked files are stat'ed, through the DirEntry (free on
+        Windows, where the listing carries the stat results). They are
+        ordered by modification time in a heap of at most `max_pending`
+        files: the oldest is yielded whenever the heap is full or `window`
+        seconds passed since the last one, so uploads start before a huge
+        or slow directory is fully listed.
+        """
+        pending: list[tuple[float, str]] = []
+        last_yield: float = time.monotonic()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file() or self.is_tracked(entry.path):
+                        continue
+                    mtime: float = entry.stat().st_mtime
+                except OSError:
+                    # Renamed or deleted since the directory was listed
                     continue
 
-                yield file
+                heapq.heappush(pending, (mtime, entry.path))
+                if len(pending) >= max_pending or time.monotonic() - last_yield >= window:
+                    yield Path(heapq.heappop(pending)[1])
+                    last_yield = time.monotonic()
 
-            log.info("Sleeping for 15 seconds...")
-            time.sleep(15)
+        while pending:
+            yield Path(heapq.heappop(pending)[1])
 
     def _check_all_tables(self, video) -> None:
         """Check all tables in the database."""
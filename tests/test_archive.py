@@ -0,0 +1,96 @@
+import io
+import os
+
+import pytest
+
+from uploaders.archive import ArchiveUploader
+
+DATA = os.urandom(100_000)
+
+
+@pytest.fixture
+def vod(tmp_path):
+    path = tmp_path / "recorder" / "2023-10-05 12-34-56 - Character - Boss [M] (Kill).mp4"
+    path.parent.mkdir()
+    path.write_bytes(DATA)
+    return path
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return ArchiveUploader(directory=tmp_path / "archive", move=False)
+
+
+def test_hardlink(vod, archive):
+    result = archive.upload_video(str(vod), "t", "d", [])
+    assert result == str(archive.directory / vod.name)
+    assert os.path.samefile(result, vod)
+
+
+def test_move(vod, archive):
+    archive.move = True
+    result = archive.upload_video(str(vod), "t", "d", [])
+    assert not vod.exists()
+    assert open(result, "rb").read() == DATA
+
+
+def test_copy_file_range_when_link_fails(vod, archive, monkeypatch):
+    monkeypatch.setattr(os, "link", _raise)
+    result = archive.upload_video(str(vod), "t", "d", [])
+    assert not os.path.samefile(result, vod)
+    assert open(result, "rb").read() == DATA
+    assert os.stat(result).st_mtime == vod.stat().st_mtime
+
+
+@pytest.mark.parametrize("unavailable", [["copy_file_range"], ["copy_file_range", "sendfile"]])
+def test_copy_fallbacks(vod, archive, monkeypatch, unavailable):
+    monkeypatch.setattr(os, "link", _raise)
+    for name in unavailable:
+        monkeypatch.setattr(os, name, _raise, raising=False)
+    result = archive.upload_video(str(vod), "t", "d", [])
+    assert open(result, "rb").read() == DATA
+    assert not (archive.directory / (vod.name + ".partial")).exists()
+
+
+def test_short_copy_falls_back(vod, archive, monkeypatch):
+    def short_copy(src, dst, count, offset_src, offset_dst):
+        # Copies part of the file, then reports the end of it
+        if offset_src:
+            return 0
+        os.pwrite(dst, DATA[:1000], 0)
+        return 1000
+
+    monkeypatch.setattr(os, "link", _raise)
+    monkeypatch.setattr(os, "copy_file_range", short_copy, raising=False)
+    result = archive.upload_video(str(vod), "t", "d", [])
+    assert open(result, "rb").read() == DATA
+
+
+def test_already_archived(vod, archive, monkeypatch):
+    archive.upload_video(str(vod), "t", "d", [])
+    monkeypatch.setattr(os, "link", _raise)
+    assert archive.upload_video(str(vod), "t", "d", []) == str(archive.directory / vod.name)
+
+
+def test_upload_stream(vod, archive):
+    result = archive.upload_stream(io.BytesIO(DATA), str(vod), "t", "d", [])
+    assert open(result, "rb").read() == DATA
+    assert archive.last_digest.startswith("sha256:")
+
+
+def test_upload_stream_copies_when_moving(vod, archive, caplog):
+    archive.move = True
+    archive.upload_stream(io.BytesIO(DATA), str(vod), "t", "d", [])
+    assert vod.exists()
+    assert "not moved" in caplog.text
+
+
+def test_without_archive_section(tmp_path, monkeypatch):
+    monkeypatch.setattr("uploaders.archive.settings.archive", None)
+    assert not ArchiveUploader(directory=tmp_path / "archive").move
+    with pytest.raises(ValueError):
+        ArchiveUploader()
+
+
+def _raise(*args, **kwargs):
+    raise OSError("not supported")
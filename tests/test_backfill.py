@@ -0,0 +1,111 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from backfill import backfill
+from mp4 import FTYP, moov_box
+from quota import QuotaExceededError, pacific_now
+from watcher import FileWatcher
+
+VALID = [
+    "2023-10-05 12-34-56 - Character - Boss [M] (Kill).mp4",
+    "2023-10-06 12-34-56 - Character - Boss [M] (Kill).mp4",
+    "2023-10-07 12-34-56 - Character - Boss [M] (Kill).mp4",
+]
+INVALID = [
+    "2023-10-05 12-34-56 - Character - Boss [M] (Wipe).mp4",
+    "2023-10-05 12-34-56 - Character - Boss [HC] (Kill).mp4",
+    "2023-10-05 12-34-56 - Character - Boss (Kill).mp4",
+    "notes.txt",
+]
+VOD = FTYP + moov_box(duration=300, width=1920, height=1080)
+
+
+class TestBackfill(TestCase):
+    def setUp(self):
+        self.patcher_settings = patch("video.settings")
+        mock_settings = self.patcher_settings.start()
+        mock_settings.warcraft.file_types = [".mp4"]
+        mock_settings.warcraft.search_keywords = ["Kill"]
+        mock_settings.warcraft.difficulties = ["Mythic"]
+
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.test_dir_path = Path(self.test_dir.name)
+        self.vod_dir = self.test_dir_path / "vods"
+        self.vod_dir.mkdir()
+        # Newest first on disk, the backfill must upload oldest first
+        for i, name in enumerate(reversed(VALID)):
+            file = self.vod_dir / name
+            file.write_bytes(VOD)
+            os.utime(file, (1000 - i, 1000 - i))
+        for name in INVALID:
+            (self.vod_dir / name).touch()
+
+        self.watcher = FileWatcher(directory=self.vod_dir, db_path=self.test_dir_path / "test.db")
+        self.uploaded = []
+
+    def tearDown(self):
+        self.patcher_settings.stop()
+        self.watcher.conn.close()
+        self.test_dir.cleanup()
+
+    def handle(self, video):
+        if "10-06" in video.file.name and self.fail:
+            raise RuntimeError("upload failed")
+        if "10-06" in video.file.name and self.quota_exhausted:
+            raise QuotaExceededError("videos.insert", pacific_now())
+        self.uploaded.append(video.file.name)
+        self.watcher.start_tracking(str(video.file), video_id=video.file.name)
+        return video.file.name
+
+    fail = False
+    quota_exhausted = False
+
+    def test_backfill(self):
+        self.watcher.start_tracking(str(self.vod_dir / VALID[0]), video_id="old")
+        summary = backfill(self.watcher, self.handle, workers=4)
+
+        self.assertEqual(self.uploaded, VALID[1:])
+        self.assertEqual(summary.found, 7)
+        self.assertEqual(summary.already_tracked, 1)
+        self.assertEqual(summary.invalid, 4)
+        self.assertEqual(summary.queued, 2)
+        self.assertEqual(summary.uploaded, 2)
+        self.assertEqual(summary.uploaded_bytes, 2 * len(VOD))
+        self.assertEqual(self.watcher.queued_files(), [])
+
+    def test_quota_exhaustion_defers_the_rest(self):
+        self.quota_exhausted = True
+        summary = backfill(self.watcher, self.handle)
+        self.assertEqual(self.uploaded, VALID[:1])
+        self.assertEqual(summary.uploaded, 1)
+        self.assertEqual(summary.deferred, 2)
+        self.assertEqual(summary.failed, 0)
+        self.assertEqual(
+            self.watcher.queued_files(), [str(self.vod_dir / name) for name in VALID[1:]]
+        )
+
+    def test_failures_stay_queued(self):
+        self.fail = True
+        summary = backfill(self.watcher, self.handle)
+        self.assertEqual(summary.uploaded, 2)
+        self.assertEqual(summary.failed, 1)
+        self.assertEqual(self.watcher.queued_files(), [str(self.vod_dir / VALID[1])])
+        self.assertFalse(self.watcher.is_tracked(str(self.vod_dir / VALID[1])))
+
+        # A second run picks up what is left
+        self.fail = False
+        summary = backfill(self.watcher, self.handle)
+        self.assertEqual(summary.queued, 1)
+        self.assertEqual(summary.uploaded, 1)
+        self.assertEqual(self.watcher.queued_files(), [])
+
+    def test_dry_run(self):
+        handle = MagicMock()
+        summary = backfill(self.watcher, handle, dry_run=True)
+        handle.assert_not_called()
+        self.assertEqual(summary.queued, 3)
+        self.assertEqual(summary.queued_bytes, 3 * len(VOD))
+        self.assertEqual(self.watcher.queued_files(), [])
@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+
+import pytest
+
+from database import Database, connect
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(tmp_path / "test.db", commit_interval=0.02)
+    database.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+    yield database
+    database.close()
+
+
+def test_wal_mode(db):
+    assert db.read("PRAGMA journal_mode") == [("wal",)]
+
+
+def test_writes_are_visible_to_readers(db):
+    assert db.execute("INSERT INTO items (name) VALUES (?)", ("a",)) == 1
+    assert db.read("SELECT name FROM items") == [("a",)]
+
+
+def test_concurrent_writes_are_group_committed(db):
+    def write(i):
+        db.execute("INSERT INTO items (name) VALUES (?)", (f"item{i}",))
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert db.read("SELECT COUNT(*) FROM items") == [(50,)]
+    stats = db.stats()
+    assert stats.writes == 51
+    assert stats.commits < stats.writes
+    assert stats.batch_size_max > 1
+    assert stats.latency_max_ms >= stats.latency_p50_ms > 0
+
+
+def test_failed_write_does_not_affect_its_batch(db):
+    ok = db.execute("INSERT INTO items (name) VALUES (?)", ("a",), wait=False)
+    duplicate = db.execute("INSERT INTO items (name) VALUES (?)", ("a",), wait=False)
+    other = db.execute("INSERT INTO items (name) VALUES (?)", ("b",), wait=False)
+    assert ok.result() == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        duplicate.result()
+    assert other.result() == 1
+    assert db.read("SELECT name FROM items ORDER BY name") == [("a",), ("b",)]
+
+
+def test_executemany(db):
+    assert db.executemany("INSERT OR IGNORE INTO items (name) VALUES (?)", [("a",), ("b",), ("a",)]) == 2
+
+
+def test_writes_outside_a_transaction(db):
+    queued = [
+        db.execute("INSERT INTO items (name) VALUES (?)", (f"item{i}",), wait=False)
+        for i in range(3)
+    ]
+    # VACUUM fails inside a transaction
+    db.submit(lambda conn: conn.execute("VACUUM"), transaction=False)
+    assert [future.result() for future in queued] == [1, 1, 1]
+    assert db.execute("INSERT INTO items (name) VALUES (?)", ("after",)) == 1
+    assert db.read("SELECT COUNT(*) FROM items") == [(4,)]
+
+
+def test_readers_per_thread(db):
+    readers = []
+    thread = threading.Thread(target=lambda: readers.append(db.reader))
+    thread.start()
+    thread.join()
+    assert readers[0] is not db.reader
+    assert db.reader is db.reader
+
+
+def test_readers_closed_when_their_thread_exits(db):
+    readers = []
+
+    def read():
+        assert db.read("SELECT COUNT(*) FROM items") == [(0,)]
+        readers.append(db.reader)
+
+    for _ in range(50):
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+    assert len(readers) == 50
+    for conn in readers:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    assert db._readers == set()
+    # The reader of a live thread stays open
+    assert db.read("SELECT COUNT(*) FROM items") == [(0,)]
+    assert db._readers == {db.reader}
+
+
+def test_close_commits_pending_writes(tmp_path):
+    database = Database(tmp_path / "test.db")
+    database.execute("CREATE TABLE items (name TEXT)")
+    database.execute("INSERT INTO items VALUES ('a')", wait=False)
+    database.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        database.execute("INSERT INTO items VALUES ('b')")
+    assert sqlite3.connect(tmp_path / "test.db").execute("SELECT * FROM items").fetchall() == [("a",)]
+
+
+def test_connect_shares_one_writer(tmp_path):
+    db = connect(tmp_path / "test.db")
+    assert connect(tmp_path / "." / "test.db") is db
+    db.close()
+    reopened = connect(tmp_path / "test.db")
+    assert reopened is not db
+    reopened.close()
@@ -0,0 +1,139 @@
+import hashlib
+import threading
+import time
+from typing import BinaryIO
+
+import pytest
+
+from quota import QuotaExceededError, pacific_now
+from uploaders.fanout import FanOutUploader, SinkStream
+
+CHUNK = 1024
+DATA = bytes(range(256)) * 40
+
+
+class StreamSink:
+    """Reads the stream in uneven pieces, optionally rewinding or pausing"""
+
+    def __init__(self, delay: float = 0.0, rewind: bool = False, fail: bool = False):
+        self.delay = delay
+        self.rewind = rewind
+        self.fail = fail
+        self.data = b""
+        self.done = threading.Event()
+        self.last_digest = None
+
+    def upload_video(self, file_path, title, description, tags):
+        raise AssertionError("stream sinks should not open the file")
+
+    def upload_stream(self, stream: BinaryIO, file_path, title, description, tags):
+        stream.seek(0, 2)
+        size = stream.tell()
+        stream.seek(0)
+        while stream.tell() < size:
+            if self.fail:
+                raise RuntimeError("sink failed")
+            begin = stream.tell()
+            piece = stream.read(700)
+            if self.rewind and begin and begin % 3 == 0:
+                # Server acknowledged only part of the piece
+                stream.seek(begin + 100)
+                piece = piece[:100] + stream.read(600)
+            self.data += piece
+            time.sleep(self.delay)
+        self.done.set()
+        return f"stream-{len(self.data)}"
+
+
+class FileSink:
+    def __init__(self):
+        self.last_digest = None
+
+    def upload_video(self, file_path, title, description, tags):
+        with open(file_path, "rb") as f:
+            return f"file-{len(f.read())}"
+
+
+@pytest.fixture
+def vod(tmp_path):
+    path = tmp_path / "vod.mp4"
+    path.write_bytes(DATA)
+    return str(path)
+
+
+def test_every_sink_gets_the_file(vod):
+    fast, rewinding, plain = StreamSink(), StreamSink(rewind=True), FileSink()
+    uploader = FanOutUploader(
+        {"fast": fast, "rewinding": rewinding, "plain": plain}, chunk_size=CHUNK
+    )
+    assert uploader.upload_video(vod, "title", "desc", []) == f"stream-{len(DATA)}"
+    assert fast.data == DATA
+    assert rewinding.data == DATA
+    assert [s.status for s in uploader.sinks] == ["succeeded"] * 3
+    assert uploader.sinks[2].result == f"file-{len(DATA)}"
+    assert uploader.last_digest == f"sha256:{hashlib.sha256(DATA).hexdigest()}"
+
+
+def test_slow_sink_does_not_stall_others(vod):
+    fast, slow = StreamSink(), StreamSink(delay=0.05)
+    uploader = FanOutUploader({"fast": fast, "slow": slow}, chunk_size=CHUNK, buffer_chunks=2)
+    thread = threading.Thread(target=uploader.upload_video, args=(vod, "t", "d", []))
+    thread.start()
+    assert fast.done.wait(5)
+    assert not slow.done.is_set()
+    thread.join()
+    assert slow.data == DATA
+    assert uploader.sinks[1].stream.detached
+    assert uploader.sinks[1].progress == 1.0
+
+
+def test_secondary_failure_is_isolated(vod):
+    primary, broken = StreamSink(), StreamSink(fail=True)
+    uploader = FanOutUploader({"primary": primary, "broken": broken}, chunk_size=CHUNK, buffer_chunks=1)
+    assert uploader.upload_video(vod, "t", "d", []) == f"stream-{len(DATA)}"
+    assert uploader.sinks[1].status == "failed"
+
+
+class QuotaSink(StreamSink):
+    def upload_stream(self, stream, file_path, title, description, tags):
+        raise QuotaExceededError("videos.insert", pacific_now())
+
+
+def test_secondary_quota_exhaustion_raises(vod):
+    archive = StreamSink()
+    uploader = FanOutUploader({"archive": archive, "youtube": QuotaSink()}, chunk_size=CHUNK)
+    with pytest.raises(QuotaExceededError):
+        uploader.upload_video(vod, "t", "d", [])
+    assert archive.data == DATA
+
+
+def test_primary_failure_raises(vod):
+    uploader = FanOutUploader({"broken": StreamSink(fail=True), "ok": StreamSink()}, chunk_size=CHUNK)
+    with pytest.raises(RuntimeError):
+        uploader.upload_video(vod, "t", "d", [])
+    assert uploader.sinks[1].status == "succeeded"
+
+
+def test_detach_wakes_a_waiting_sink(vod):
+    stream = SinkStream(vod, len(DATA), buffer_chunks=1)
+    result = []
+    reader = threading.Thread(target=lambda: result.append(stream.read(CHUNK)), daemon=True)
+    reader.start()
+    # The sink drained its queue and waits for the next chunk
+    time.sleep(0.1)
+    stream.detach()
+    reader.join(5)
+    assert not reader.is_alive()
+    assert result == [DATA[:CHUNK]]
+    stream.close()
+
+
+def test_sink_stream_rewind_behind_window(vod):
+    stream = SinkStream(vod, len(DATA), buffer_chunks=16)
+    for offset in range(0, len(DATA), CHUNK):
+        stream.feed(DATA[offset : offset + CHUNK], block=False)
+    assert stream.read(3000) == DATA[:3000]
+    assert stream.read(3000) == DATA[3000:6000]
+    stream.seek(10)
+    assert stream.read(20) == DATA[10:30]
+    stream.close()
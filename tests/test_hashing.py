@@ -0,0 +1,61 @@
+import hashlib
+import io
+
+import pytest
+
+from uploaders.hashing import StreamHasher
+
+DATA = bytes(range(256)) * 64
+EXPECTED = f"sha256:{hashlib.sha256(DATA).hexdigest()}"
+
+
+def test_sequential_chunks():
+    hasher = StreamHasher()
+    for offset in range(0, len(DATA), 1000):
+        hasher.update(offset, DATA[offset : offset + 1000])
+    assert hasher.finalize(len(DATA)) == EXPECTED
+
+
+def test_retried_and_rewound_chunks():
+    hasher = StreamHasher()
+    hasher.update(0, DATA[:4000])
+    # Server only acknowledged 2500 bytes, client resends from there
+    hasher.update(2500, DATA[2500:6500])
+    # Whole chunk retried
+    hasher.update(2500, DATA[2500:6500])
+    hasher.update(6500, DATA[6500:])
+    assert hasher.finalize(len(DATA)) == EXPECTED
+
+
+def test_gap_is_read_from_source():
+    source = io.BytesIO(DATA)
+    hasher = StreamHasher(source=source)
+    hasher.update(0, DATA[:1000])
+    source.seek(5000)
+    hasher.update(3000, DATA[3000:5000])
+    assert source.tell() == 5000
+    assert hasher.finalize(len(DATA)) == EXPECTED
+
+
+def test_gap_without_source():
+    hasher = StreamHasher()
+    with pytest.raises(ValueError):
+        hasher.update(10, DATA[10:20])
+
+
+def test_blake2():
+    hasher = StreamHasher("blake2b")
+    hasher.update(0, DATA)
+    assert hasher.digest == f"blake2b:{hashlib.blake2b(DATA).hexdigest()}"
+
+
+def test_hashing_media_upload():
+    from uploaders.youtube import HashingMediaUpload
+
+    media = HashingMediaUpload(io.BytesIO(DATA), "video/mp4", chunksize=4096)
+    assert not media.has_stream()
+    assert media.getbytes(0, 4096) == DATA[:4096]
+    # Rewind after a partially acknowledged chunk
+    assert media.getbytes(1024, 4096) == DATA[1024:5120]
+    media.getbytes(5120, len(DATA))
+    assert media.digest == EXPECTED
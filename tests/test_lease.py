@@ -0,0 +1,207 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from lease import Lease, sync_clock
+from main import handle_upload
+from quota import QuotaExceededError, pacific_now
+from retention import Retention
+from video import Video
+from watcher import FileWatcher
+
+FILES = [f"/vods/vod{i}.mp4" for i in range(30)]
+
+
+def upload_all(directory, db_path, node, results):
+    """Claims and 'uploads' every file it can, like one uploader node."""
+    watcher = FileWatcher(directory=Path(directory), db_path=Path(db_path))
+    for file_path in FILES:
+        lease = Lease(watcher, file_path, node=node, duration=5)
+        if not lease.acquire():
+            continue
+        with lease:
+            time.sleep(0.01)
+            if not lease.complete(node):
+                continue
+        results.put((node, file_path))
+    watcher.close()
+
+
+def claim_and_crash(directory, db_path):
+    watcher = FileWatcher(directory=Path(directory), db_path=Path(db_path))
+    watcher.claim(FILES[0], "crashed", lease=0.5)
+    watcher.db.flush()
+    os._exit(1)
+
+
+class TestLease(TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.test_dir_path = Path(self.test_dir.name)
+        self.db_path = self.test_dir_path / "test.db"
+        self.watcher = FileWatcher(directory=self.test_dir_path, db_path=self.db_path)
+        self.context = multiprocessing.get_context("spawn")
+
+    def tearDown(self):
+        self.watcher.close()
+        self.test_dir.cleanup()
+
+    def status(self, file_path):
+        return self.watcher.conn.execute(
+            f"SELECT status, claimed_by FROM {self.watcher.table_name} WHERE file_path = ?",
+            (file_path,),
+        ).fetchone()
+
+    def test_claim_is_exclusive(self):
+        self.assertTrue(self.watcher.claim(FILES[0], "a", lease=60))
+        self.assertFalse(self.watcher.claim(FILES[0], "b", lease=60))
+        # Claims are re-entrant
+        self.assertTrue(self.watcher.claim(FILES[0], "a", lease=60))
+        self.assertEqual(self.status(FILES[0]), ("uploading", "a"))
+        self.assertFalse(self.watcher.is_tracked(FILES[0]))
+
+    def test_uploaded_files_cannot_be_claimed(self):
+        self.watcher.start_tracking(FILES[0], video_id="x")
+        self.assertFalse(self.watcher.claim(FILES[0], "a", lease=60))
+
+    def test_queued_files_can_be_claimed(self):
+        self.watcher.enqueue_many([FILES[0]])
+        self.assertTrue(self.watcher.claim(FILES[0], "a", lease=60))
+        self.assertEqual(self.watcher.queued_files(), [])
+
+    def test_expired_lease_is_taken_over(self):
+        self.assertTrue(self.watcher.claim(FILES[0], "a", lease=0.05))
+        time.sleep(0.1)
+        self.assertTrue(self.watcher.claim(FILES[0], "b", lease=60))
+        self.assertFalse(self.watcher.renew(FILES[0], "a", lease=60))
+        self.assertEqual(self.status(FILES[0]), ("uploading", "b"))
+
+    def test_heartbeat_keeps_the_lease(self):
+        lease = Lease(self.watcher, FILES[0], node="a", duration=0.15)
+        self.assertTrue(lease.acquire())
+        with lease:
+            time.sleep(0.4)
+            self.assertFalse(self.watcher.claim(FILES[0], "b", lease=60))
+            self.assertTrue(lease.complete("x"))
+        self.assertFalse(lease.lost)
+        self.assertEqual(self.status(FILES[0]), ("uploaded", "a"))
+
+    def test_lease_taken_over_during_upload(self):
+        watcher = self.watcher
+
+        class TakenOverUploader:
+            last_digest = "sha256:a"
+
+            def upload_video(self, file_path, title, description, tags):
+                # The lease expires and node b claims and uploads the file meanwhile
+                watcher.db.execute(
+                    f"UPDATE {watcher.table_name} SET lease_expires = 0 WHERE file_path = ?",
+                    (file_path,),
+                )
+                assert watcher.claim(file_path, "b", lease=60)
+                assert watcher.finish_upload(file_path, "b", video_id="b-id", digest="sha256:b")
+                return "a-id"
+
+        file = self.test_dir_path / "2023-10-05 12-34-56 - Character - Boss [M] (Kill).mp4"
+        file.touch()
+        video = Video(file)
+        with self.assertLogs("main", level="ERROR") as logs:
+            result = handle_upload(
+                video, TakenOverUploader(), watcher, Retention(watcher), None
+            )
+        self.assertIsNone(result)
+        self.assertIn("a-id", logs.output[0])
+        # The record of node b is kept
+        self.assertEqual(self.status(str(file)), ("uploaded", "b"))
+        self.assertEqual(watcher.get_digest(str(file)), "sha256:b")
+        video_id = watcher.conn.execute(
+            f"SELECT video_id FROM {watcher.table_name} WHERE file_path = ?", (str(file),)
+        ).fetchone()[0]
+        self.assertEqual(video_id, "b-id")
+
+    def test_quota_exhaustion_queues_the_video_again(self):
+        class ExhaustedUploader:
+            last_digest = None
+
+            def upload_video(self, file_path, title, description, tags):
+                raise QuotaExceededError("videos.insert", pacific_now())
+
+        file = self.test_dir_path / "2023-10-05 12-34-56 - Character - Boss [M] (Kill).mp4"
+        file.touch()
+        with self.assertRaises(QuotaExceededError):
+            handle_upload(
+                Video(file), ExhaustedUploader(), self.watcher, Retention(self.watcher), None
+            )
+        self.assertEqual(self.status(str(file)), ("queued", None))
+        self.assertTrue(self.watcher.claim(str(file), "b", lease=60))
+
+    def test_complete_after_takeover(self):
+        lease = Lease(self.watcher, FILES[0], node="a", duration=0.05)
+        self.assertTrue(lease.acquire())
+        time.sleep(0.1)
+        self.assertTrue(self.watcher.claim(FILES[0], "b", lease=60))
+        self.assertFalse(lease.complete("a-id"))
+        self.assertTrue(lease.lost)
+        self.assertEqual(self.status(FILES[0]), ("uploading", "b"))
+
+    def test_local_clock_needs_no_offset(self):
+        self.assertAlmostEqual(sync_clock(self.watcher), 0, delta=2)
+        self.assertEqual(list(self.test_dir_path.glob("*.clock")), [])
+
+    def test_clock_skew_is_corrected(self):
+        real_time = time.time
+        # A node whose clock is ten minutes behind
+        skewed = FileWatcher(directory=self.test_dir_path, db_path=self.db_path)
+        with patch("time.time", side_effect=lambda: real_time() - 600):
+            with self.assertLogs("lease", level="WARNING"):
+                self.assertAlmostEqual(sync_clock(skewed), 600, delta=2)
+            self.assertTrue(skewed.claim(FILES[0], "a", lease=60))
+        # Without the offset the claim would look expired for 9 minutes already
+        self.assertFalse(self.watcher.claim(FILES[0], "b", lease=60))
+
+    def test_failure_releases_the_claim(self):
+        lease = Lease(self.watcher, FILES[0], node="a", duration=60)
+        self.assertTrue(lease.acquire())
+        with self.assertRaises(RuntimeError):
+            with lease:
+                raise RuntimeError("upload failed")
+        self.assertEqual(self.watcher.queued_files(), [FILES[0]])
+        self.assertTrue(self.watcher.claim(FILES[0], "b", lease=60))
+
+    def test_nodes_split_the_backlog(self):
+        results = self.context.Queue()
+        nodes = [
+            self.context.Process(
+                target=upload_all,
+                args=(str(self.test_dir_path), str(self.db_path), f"node-{i}", results),
+            )
+            for i in range(3)
+        ]
+        for node in nodes:
+            node.start()
+        uploads = [results.get(timeout=60) for _ in FILES]
+        for node in nodes:
+            node.join(60)
+            self.assertEqual(node.exitcode, 0)
+
+        # Every file uploaded exactly once
+        self.assertEqual(sorted(file_path for _, file_path in uploads), sorted(FILES))
+        self.assertTrue(results.empty())
+        self.assertEqual(self.watcher.tracked_files(), set(FILES))
+
+    def test_crashed_node_is_taken_over(self):
+        crashed = self.context.Process(
+            target=claim_and_crash, args=(str(self.test_dir_path), str(self.db_path))
+        )
+        crashed.start()
+        crashed.join(60)
+        self.assertEqual(self.status(FILES[0]), ("uploading", "crashed"))
+        self.assertFalse(self.watcher.claim(FILES[0], "b", lease=60))
+
+        time.sleep(0.6)
+        self.assertTrue(self.watcher.claim(FILES[0], "b", lease=60))
+        self.assertEqual(self.status(FILES[0]), ("uploading", "b"))
@@ -0,0 +1,132 @@
+import gzip
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import QueueHandler
+from pathlib import Path
+from unittest import TestCase
+
+from logger import CompressingRotatingFileHandler, JsonFormatter, RateLimitFilter
+
+
+def make_record(msg, *args, level=logging.INFO, name="test", line=1, rate_limit=None):
+    record = logging.LogRecord(name, level, __file__, line, msg, args, None)
+    if rate_limit is not None:
+        record.rate_limit = rate_limit
+    return record
+
+
+def progress(percent, line=1):
+    return make_record(f"Uploaded {percent}%", line=line, rate_limit=True)
+
+
+class TestRateLimitFilter(TestCase):
+    def test_drops_repetitive_messages(self):
+        rate_limit = RateLimitFilter(rate=3, per=60)
+        passed = [rate_limit.filter(progress(i)) for i in range(10)]
+        self.assertEqual(passed, [True] * 3 + [False] * 7)
+        # Other call sites have their own budget
+        self.assertTrue(rate_limit.filter(progress(100, line=2)))
+
+    def test_only_marked_messages_are_limited(self):
+        # Per-VOD lines only differ in the date and time of their file name
+        rate_limit = RateLimitFilter(rate=1, per=60)
+        for day in range(10, 30):
+            record = make_record(f"Tracking file: 2023-10-{day} 12-34-56 - Boss [M] (Kill).mp4")
+            self.assertTrue(rate_limit.filter(record))
+        self.assertTrue(rate_limit.filter(progress(1)))
+        self.assertFalse(rate_limit.filter(progress(2)))
+
+    def test_reports_suppressed_count(self):
+        rate_limit = RateLimitFilter(rate=1, per=0.05)
+        rate_limit.filter(progress(1))
+        rate_limit.filter(progress(2))
+        rate_limit.filter(progress(3))
+        time.sleep(0.06)
+        record = progress(4)
+        self.assertTrue(rate_limit.filter(record))
+        self.assertEqual(record.getMessage(), "Uploaded 4% (2 similar messages suppressed)")
+
+    def test_never_drops_warnings(self):
+        rate_limit = RateLimitFilter(rate=1, per=60)
+        for _ in range(5):
+            record = make_record("Retrying", level=logging.WARNING, rate_limit=True)
+            self.assertTrue(rate_limit.filter(record))
+
+    def test_disabled(self):
+        rate_limit = RateLimitFilter(rate=0)
+        self.assertTrue(all(rate_limit.filter(progress(1)) for _ in range(100)))
+
+
+class TestJsonFormatter(TestCase):
+    def test_format(self):
+        entry = json.loads(JsonFormatter().format(make_record("Uploaded %s", "video")))
+        self.assertEqual(entry["message"], "Uploaded video")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["logger"], "test")
+
+    def test_exception(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord("test", logging.ERROR, __file__, 1, "failed", None, sys.exc_info())
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertIn("ValueError: boom", entry["exception"])
+
+
+class TestCompressingRotatingFileHandler(TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.log_file = Path(self.test_dir.name, "app.log")
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_rotates_by_size(self):
+        handler = CompressingRotatingFileHandler(self.log_file, max_bytes=100, backup_count=2)
+        for i in range(10):
+            handler.emit(make_record("x" * 40))
+        handler.close()
+
+        rotated = sorted(p.name for p in self.log_file.parent.iterdir())
+        self.assertEqual(rotated, ["app.log", "app.log.1.gz", "app.log.2.gz"])
+        with gzip.open(self.log_file.with_name("app.log.1.gz"), "rt") as f:
+            self.assertIn("x" * 40, f.read())
+
+    def test_rotates_by_time(self):
+        self.log_file.write_text("old\n")
+        handler = CompressingRotatingFileHandler(
+            self.log_file, max_bytes=0, backup_count=1, interval=3600, compress=False
+        )
+        handler.rollover_at = time.time() - 1
+        handler.emit(make_record("new"))
+        handler.close()
+
+        self.assertEqual(self.log_file.with_name("app.log.1").read_text(), "old\n")
+        self.assertEqual(self.log_file.read_text(), "new\n")
+        self.assertGreater(handler.rollover_at, time.time())
+
+    def test_time_schedule_survives_restarts(self):
+        handler = CompressingRotatingFileHandler(
+            self.log_file, max_bytes=0, backup_count=1, interval=3600
+        )
+        self.assertAlmostEqual(handler.rollover_at, time.time() + 3600, delta=1)
+        handler.emit(make_record("written"))
+        handler.close()
+
+        # Restarted 50 minutes later, writing to the log does not move the schedule
+        handler.schedule_file.write_text(f"{time.time() - 3000}\n")
+        os.utime(self.log_file)
+        handler = CompressingRotatingFileHandler(
+            self.log_file, max_bytes=0, backup_count=1, interval=3600
+        )
+        self.assertAlmostEqual(handler.rollover_at, time.time() + 600, delta=1)
+        handler.close()
+
+
+def test_root_logger_is_queued():
+    # pytest adds its own capture handlers
+    assert QueueHandler in [type(h) for h in logging.getLogger().handlers]
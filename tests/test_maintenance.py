@@ -0,0 +1,142 @@
+import json
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from maintenance import Maintenance
+from retention import Retention
+from watcher import FileWatcher
+
+Usage = namedtuple("Usage", "total used free")
+
+
+class TestMaintenance(TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.test_dir_path = Path(self.test_dir.name)
+        self.watcher = FileWatcher(
+            directory=self.test_dir_path, db_path=self.test_dir_path / "test.db"
+        )
+        self.maintenance = Maintenance(
+            self.watcher, archive_after_days=30, analyze_every_hours=24, vacuum_every_hours=0
+        )
+
+    def tearDown(self):
+        self.watcher.close()
+        self.test_dir.cleanup()
+
+    def age(self, file_path, days):
+        self.watcher.db.execute(
+            f"UPDATE {self.watcher.table_name} SET uploaded_at = datetime('now', ?) "
+            "WHERE file_path = ?",
+            (f"-{days} days", file_path),
+        )
+
+    def count(self, table):
+        return self.watcher.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_archive(self):
+        self.watcher.start_tracking("/vods/old.mp4", video_id="a")
+        self.watcher.start_tracking("/vods/new.mp4", video_id="b")
+        self.watcher.enqueue_many(["/vods/queued.mp4"])
+        self.age("/vods/old.mp4", 40)
+
+        stats = self.maintenance.archive()
+        self.assertEqual(stats.rows, 1)
+        self.assertEqual(self.count(self.watcher.table_name), 2)
+        self.assertEqual(self.count(self.watcher.archive_table), 1)
+        # Archived files still count as uploaded and cannot be claimed again
+        self.assertTrue(self.watcher.is_tracked("/vods/old.mp4"))
+        self.assertIn("/vods/old.mp4", self.watcher.tracked_files())
+        self.assertFalse(self.watcher.claim("/vods/old.mp4", "node", lease=60))
+
+    def test_archive_twice_keeps_earlier_rows(self):
+        for name in ("a", "b"):
+            self.watcher.start_tracking(f"/vods/{name}.mp4", video_id=name)
+            self.age(f"/vods/{name}.mp4", 40)
+        self.maintenance.archive()
+        # The hot table is empty, so C gets the id A had
+        self.watcher.start_tracking("/vods/c.mp4", video_id="c")
+        self.age("/vods/c.mp4", 40)
+        self.maintenance.archive()
+
+        self.assertEqual(self.count(self.watcher.archive_table), 3)
+        for name in ("a", "b", "c"):
+            self.assertTrue(self.watcher.is_tracked(f"/vods/{name}.mp4"))
+
+    @patch("retention.shutil.disk_usage", return_value=Usage(1000, 950, 50))
+    def test_retention_after_archive(self, mock_usage):
+        files = []
+        for name in ("old", "new"):
+            file = self.test_dir_path / f"{name}.mp4"
+            file.write_bytes(b"x" * 100)
+            self.watcher.start_tracking(str(file), video_id=name, digest=f"sha256:{name}")
+            files.append(file)
+        self.age(str(files[0]), 40)
+        self.maintenance.archive()
+
+        self.assertEqual(self.watcher.reclaimable_files(), [str(files[0]), str(files[1])])
+        self.assertEqual(self.watcher.get_digest(str(files[0])), "sha256:old")
+        # The oldest upload is deleted first, even though it was archived
+        self.assertEqual(Retention(self.watcher, max_usage_percent=90).enforce(), [files[0]])
+        self.assertFalse(files[0].exists())
+        self.assertEqual(self.watcher.reclaimable_files(), [str(files[1])])
+
+    def test_export_import_roundtrip(self):
+        for i in range(5):
+            self.watcher.start_tracking(f"/vods/{i}.mp4", video_id=str(i), digest=f"sha256:{i}")
+        self.watcher.enqueue_many(["/vods/queued.mp4"])
+
+        for name in ("rows.jsonl", "rows.csv"):
+            export = self.maintenance.export_rows(self.test_dir_path / name)
+            self.assertEqual(export.rows, 6)
+
+            other = FileWatcher(
+                directory=self.test_dir_path, db_path=self.test_dir_path / f"{name}.db"
+            )
+            imported = Maintenance(other).import_rows(self.test_dir_path / name)
+            self.assertEqual(imported.rows, 6)
+            self.assertEqual(other.tracked_files(), self.watcher.tracked_files())
+            self.assertEqual(other.queued_files(), ["/vods/queued.mp4"])
+            self.assertEqual(other.get_digest("/vods/3.mp4"), "sha256:3")
+            # Importing twice changes nothing
+            self.assertEqual(Maintenance(other).import_rows(self.test_dir_path / name).rows, 0)
+            other.close()
+
+        line = json.loads((self.test_dir_path / "rows.jsonl").read_text().splitlines()[0])
+        self.assertEqual(line["file_path"], "/vods/0.mp4")
+
+    def test_import_known_uploads(self):
+        known = self.test_dir_path / "known.csv"
+        known.write_text("file_path\n/vods/a.mp4\n/vods/b.mp4\n")
+        self.assertEqual(self.maintenance.import_rows(known).rows, 2)
+        self.assertEqual(self.watcher.tracked_files(), {"/vods/a.mp4", "/vods/b.mp4"})
+
+    def test_import_rejects_rows_without_path(self):
+        bad = self.test_dir_path / "bad.jsonl"
+        bad.write_text('{"video_id": "x"}\n')
+        with self.assertRaises(ValueError):
+            self.maintenance.import_rows(bad)
+
+    def test_vacuum_and_analyze(self):
+        self.watcher.enqueue_many([f"/vods/{i}.mp4" for i in range(5000)])
+        self.watcher.db.execute(f"DELETE FROM {self.watcher.table_name}")
+        self.assertGreater(self.maintenance.analyze().seconds, 0)
+        stats = self.maintenance.vacuum()
+        self.assertGreater(stats.bytes_before, 0)
+        self.assertLessEqual(stats.bytes_after, stats.bytes_before)
+        # The writer keeps working afterwards
+        self.watcher.start_tracking("/vods/a.mp4")
+        self.assertTrue(self.watcher.is_tracked("/vods/a.mp4"))
+
+    def test_run_due(self):
+        self.watcher.start_tracking("/vods/old.mp4", video_id="a")
+        self.age("/vods/old.mp4", 40)
+        done = [stats.operation for stats in self.maintenance.run_due()]
+        self.assertEqual(done, ["archive", "analyze"])
+        self.assertAlmostEqual(self.maintenance.last_run("analyze"), time.time(), delta=5)
+        # Nothing is due right after a run
+        self.assertEqual(self.maintenance.run_due(), [])
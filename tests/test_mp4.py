@@ -0,0 +1,104 @@
+import os
+import struct
+from unittest.mock import patch
+
+import pytest
+
+import mp4
+from mp4 import FTYP, HEADER, LARGE_SIZE, Mp4Error, box, moov_box, probe
+
+MDAT = box(b"mdat", b"\0" * 1000)
+
+
+def test_moov_at_the_end(tmp_path):
+    file = tmp_path / "vod.mp4"
+    file.write_bytes(FTYP + MDAT + moov_box(duration=312.5, width=1920, height=1080))
+    info = probe(file)
+    assert info.has_moov
+    assert info.duration == 312.5
+    assert info.resolution == "1920x1080"
+
+
+def test_faststart(tmp_path):
+    file = tmp_path / "vod.mp4"
+    file.write_bytes(FTYP + moov_box(duration=60, width=2560, height=1440) + MDAT)
+    assert probe(file).resolution == "2560x1440"
+
+
+def test_large_mdat_and_audio_track(tmp_path):
+    audio = box(b"trak", box(b"tkhd", bytes(84)))
+    moov = moov_box(duration=10, width=1280, height=720)
+    # Add an audio track (no size) before the video track
+    moov = box(b"moov", moov[8:8 + 108] + audio + moov[8 + 108:])
+    mdat = HEADER.pack(1, b"mdat") + LARGE_SIZE.pack(16 + 100) + bytes(100)
+    file = tmp_path / "vod.mp4"
+    file.write_bytes(FTYP + mdat + moov)
+    info = probe(file)
+    assert info.resolution == "1280x720"
+    assert info.duration == 10
+
+
+def test_version_1_mvhd(tmp_path):
+    mvhd = box(
+        b"mvhd", bytes([1, 0, 0, 0]) + bytes(16) + struct.pack(">IQ", 90000, 90000 * 42) + bytes(80)
+    )
+    file = tmp_path / "vod.mp4"
+    file.write_bytes(FTYP + box(b"moov", mvhd))
+    info = probe(file)
+    assert info.duration == 42
+    assert info.resolution is None
+
+
+def test_still_recording(tmp_path):
+    # The recorder writes the moov box last
+    file = tmp_path / "vod.mp4"
+    file.write_bytes(FTYP + HEADER.pack(1, b"mdat") + LARGE_SIZE.pack(0) + bytes(100))
+    assert not probe(file).has_moov
+
+
+def test_truncated(tmp_path):
+    file = tmp_path / "vod.mp4"
+    data = FTYP + moov_box(duration=60, width=1920, height=1080) + MDAT
+    file.write_bytes(data[:-10])
+    with pytest.raises(Mp4Error, match="truncated"):
+        probe(file)
+
+
+def test_cached_errors_are_raised_anew(tmp_path):
+    file = tmp_path / "vod.mp4"
+    file.write_bytes(b"x" * 100)
+    errors = []
+    for _ in range(3):
+        with pytest.raises(Mp4Error) as e:
+            probe(file)
+        errors.append(e.value)
+    assert errors[0] is not errors[1]
+    assert str(errors[0]) == str(errors[2])
+
+
+def test_not_an_mp4(tmp_path):
+    file = tmp_path / "vod.mp4"
+    file.write_bytes(b"x" * 100)
+    with pytest.raises(Mp4Error):
+        probe(file)
+
+
+def test_empty_file(tmp_path):
+    file = tmp_path / "vod.mp4"
+    file.touch()
+    assert not probe(file).has_moov
+
+
+def test_cached_until_the_file_changes(tmp_path):
+    file = tmp_path / "vod.mp4"
+    file.write_bytes(FTYP + moov_box(duration=60, width=1920, height=1080))
+    with patch("mp4._parse", wraps=mp4._parse) as parse:
+        probe(file)
+        probe(file)
+        assert parse.call_count == 1
+
+        with open(file, "ab") as f:
+            f.write(MDAT)
+        os.utime(file, ns=(0, 10**9))
+        assert probe(file).has_moov
+        assert parse.call_count == 2
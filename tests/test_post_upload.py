@@ -0,0 +1,140 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from googleapiclient.errors import HttpError
+
+from quota import QuotaTracker
+from uploaders.post_upload import PostUploadQueue
+from watcher import FileWatcher
+
+COSTS = {"videos.insert": 1600, "videos.list": 1, "playlistItems.insert": 50}
+
+
+class FakeBatch:
+    def __init__(self, callback, failures):
+        self.callback = callback
+        self.failures = failures
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append(request_id)
+
+    def execute(self):
+        for request_id in self.requests:
+            self.callback(request_id, {}, self.failures.get(request_id))
+
+
+class TestPostUploadQueue(TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.test_dir_path = Path(self.test_dir.name)
+        db_path = self.test_dir_path / "test.db"
+        self.watcher = FileWatcher(directory=self.test_dir_path, db_path=db_path)
+        self.quota = QuotaTracker(db_path=db_path, daily_limit=1_000_000, costs=COSTS)
+
+        self.batches = []
+        self.failures = {}
+        self.service = MagicMock()
+        self.service.new_batch_http_request.side_effect = self._new_batch
+        self.service.videos().list.side_effect = self._videos_list
+        self.list_calls = []
+
+        self.uploader = MagicMock(quota=self.quota)
+        self.uploader.get_authenticated_service.return_value = self.service
+        self.queue = PostUploadQueue(self.uploader, self.watcher, track_processing=True)
+
+        self.video_ids = [f"vid{i}" for i in range(120)]
+        for i, video_id in enumerate(self.video_ids):
+            self.watcher.start_tracking(str(self.test_dir_path / f"{i}.mp4"), video_id=video_id)
+
+    def tearDown(self):
+        self.watcher.conn.close()
+        self.quota.conn.close()
+        self.test_dir.cleanup()
+
+    def _new_batch(self, callback):
+        batch = FakeBatch(callback, self.failures)
+        self.batches.append(batch)
+        return batch
+
+    def _videos_list(self, part, id, maxResults):
+        ids = id.split(",")
+        self.list_calls.append(ids)
+        items = [
+            {"id": video_id, "processingDetails": {"processingStatus": "succeeded" if i % 2 else "processing"}}
+            for i, video_id in enumerate(ids)
+        ]
+        return MagicMock(execute=MagicMock(return_value={"items": items}))
+
+    def _column(self, column, video_id):
+        return self.watcher.conn.execute(
+            f"SELECT {column} FROM {self.watcher.table_name} WHERE video_id = ?", (video_id,)
+        ).fetchone()[0]
+
+    def test_playlist_insertions_are_batched(self):
+        for video_id in self.video_ids:
+            self.queue.enqueue(video_id, ["PL1"])
+        self.queue.enqueue("vid0", ["PL2"])
+        self.queue.add_to_playlists()
+
+        self.assertEqual([len(b.requests) for b in self.batches], [50, 50, 21])
+        self.assertEqual(self.queue.playlist_items, {})
+        self.assertEqual(self._column("playlists", "vid0"), "PL1,PL2")
+        self.assertEqual(self.quota.used(), 121 * 50)
+
+    def test_failed_insertions_are_retried(self):
+        self.failures["vid1|PL1"] = Exception("backend error")
+        self.failures["vid2|PL1"] = HttpError(MagicMock(status=404), b"playlist not found")
+        self.queue.enqueue("vid1", ["PL1"])
+        self.queue.enqueue("vid2", ["PL1"])
+        self.queue.add_to_playlists()
+        self.assertEqual(self.queue.playlist_items, {("vid1", "PL1"): 1})
+
+        del self.failures["vid1|PL1"]
+        self.queue.add_to_playlists()
+        self.assertEqual(self.queue.playlist_items, {})
+        self.assertEqual(self._column("playlists", "vid1"), "PL1")
+        self.assertIsNone(self._column("playlists", "vid2"))
+
+    def test_processing_is_polled_50_ids_per_call(self):
+        for video_id in self.video_ids:
+            self.queue.enqueue(video_id, [])
+        self.queue.poll_processing()
+
+        self.assertEqual([len(ids) for ids in self.list_calls], [50, 50, 20])
+        self.assertEqual(self.quota.used(), 3)
+        self.assertEqual(self._column("processing_status", "vid0"), "processing")
+        self.assertEqual(self._column("processing_status", "vid1"), "succeeded")
+        self.assertEqual(len(self.queue.processing), 60)
+
+    def test_deferred_when_quota_is_low(self):
+        self.quota.exhaust()
+        self.queue.enqueue("vid0", ["PL1"])
+        self.queue.flush()
+        self.assertEqual(self.batches, [])
+        self.assertEqual(self.list_calls, [])
+        self.assertEqual(self.queue.processing, ["vid0"])
+
+    def test_pending_operations_survive_a_restart(self):
+        self.quota.exhaust()
+        self.queue.enqueue("vid0", ["PL1", "PL2"])
+        self.queue.enqueue("vid1", [])
+        self.queue.flush()
+
+        restarted = PostUploadQueue(self.uploader, self.watcher, track_processing=True)
+        self.assertEqual(restarted.playlist_items, {("vid0", "PL1"): 0, ("vid0", "PL2"): 0})
+        self.assertEqual(restarted.processing, ["vid0", "vid1"])
+
+    def test_finished_operations_are_not_resumed(self):
+        self.failures["vid1|PL1"] = Exception("backend error")
+        self.queue.enqueue("vid0", ["PL1"])
+        self.queue.enqueue("vid1", ["PL1"])
+        self.queue.add_to_playlists()
+        self.queue.poll_processing()
+
+        restarted = PostUploadQueue(self.uploader, self.watcher, track_processing=True)
+        self.assertEqual(restarted.playlist_items, {("vid1", "PL1"): 1})
+        # vid0 is still processing in the fake API
+        self.assertEqual(restarted.processing, ["vid0"])
@@ -0,0 +1,63 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from quota import PACIFIC, QuotaExceededError, QuotaTracker
+
+COSTS = {"videos.insert": 1600, "videos.list": 1, "playlistItems.insert": 50}
+
+
+@pytest.fixture
+def now():
+    with patch("quota.pacific_now") as mock_now:
+        mock_now.return_value = datetime(2024, 3, 1, 23, 30, tzinfo=PACIFIC)
+        yield mock_now
+
+
+@pytest.fixture
+def quota(tmp_path, now):
+    tracker = QuotaTracker(db_path=tmp_path / "test.db", daily_limit=10_000, costs=COSTS)
+    yield tracker
+    tracker.conn.close()
+
+
+def test_spend(quota):
+    quota.spend("videos.insert")
+    quota.spend("videos.list", count=3)
+    assert quota.used() == 1603
+    assert quota.remaining() == 8397
+    assert quota.remaining_uploads() == 5
+
+
+def test_quota_is_per_pacific_day(quota, now):
+    for _ in range(6):
+        quota.spend("videos.insert")
+    assert not quota.can_afford("videos.insert")
+    with pytest.raises(QuotaExceededError) as e:
+        quota.check("videos.insert")
+    assert e.value.resets_at == datetime(2024, 3, 2, tzinfo=PACIFIC)
+
+    now.return_value = datetime(2024, 3, 2, 0, 1, tzinfo=PACIFIC)
+    assert quota.used() == 0
+    quota.check("videos.insert")
+
+
+def test_exhaust(quota):
+    quota.spend("videos.list")
+    quota.exhaust()
+    assert quota.remaining() == 0
+    assert quota.remaining_uploads() == 0
+    assert quota.can_afford("videos.list", count=0)
+
+
+def test_persisted(quota, tmp_path):
+    quota.spend("playlistItems.insert", count=2)
+    other = QuotaTracker(db_path=tmp_path / "test.db", daily_limit=10_000, costs=COSTS)
+    assert other.used() == 100
+    other.conn.close()
+
+
+def test_unknown_call(quota):
+    with pytest.raises(KeyError):
+        quota.spend("videos.delete")
@@ -0,0 +1,68 @@
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from retention import Retention
+from watcher import FileWatcher
+
+Usage = namedtuple("Usage", "total used free")
+
+
+class TestRetention(TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.test_dir_path = Path(self.test_dir.name)
+        self.watcher = FileWatcher(
+            directory=self.test_dir_path,
+            db_path=self.test_dir_path / "test.db",
+        )
+        self.files = []
+        for i in range(3):
+            file = self.test_dir_path / f"vod{i}.mp4"
+            file.write_bytes(b"x" * 100)
+            self.files.append(file)
+        self.retention = Retention(self.watcher, max_usage_percent=90)
+
+    def tearDown(self):
+        self.watcher.conn.close()
+        self.test_dir.cleanup()
+
+    @patch("retention.shutil.disk_usage", return_value=Usage(1000, 950, 50))
+    def test_deletes_oldest_uploads_first(self, mock_usage):
+        self.watcher.start_tracking(str(self.files[0]), video_id="a")
+        self.watcher.start_tracking(str(self.files[1]), video_id="b")
+        self.watcher.start_tracking(str(self.files[2]))  # not confirmed
+
+        self.assertEqual(self.retention.enforce(), [self.files[0]])
+        self.assertFalse(self.files[0].exists())
+        self.assertTrue(self.files[1].exists())
+        self.assertEqual(self.watcher.reclaimable_files(), [str(self.files[1])])
+        self.assertTrue(self.watcher.is_tracked(str(self.files[0])))
+
+    @patch("retention.shutil.disk_usage", return_value=Usage(1000, 1000, 0))
+    def test_never_deletes_unconfirmed(self, mock_usage):
+        self.watcher.start_tracking(str(self.files[0]), video_id="a")
+        self.watcher.start_tracking(str(self.files[1]))
+        self.assertEqual(self.retention.enforce(), [self.files[0]])
+        self.assertTrue(self.files[1].exists())
+
+    @patch("retention.shutil.disk_usage", return_value=Usage(1000, 500, 500))
+    def test_below_threshold(self, mock_usage):
+        self.watcher.start_tracking(str(self.files[0]), video_id="a")
+        self.assertEqual(self.retention.enforce(), [])
+        self.assertTrue(self.files[0].exists())
+
+    @patch("retention.shutil.disk_usage", return_value=Usage(1000, 950, 50))
+    def test_skips_hard_linked_archives(self, mock_usage):
+        # An archive on the same drive hard links the VOD instead of copying it
+        archive = self.test_dir_path / "archive"
+        archive.mkdir()
+        (archive / self.files[0].name).hardlink_to(self.files[0])
+        self.watcher.start_tracking(str(self.files[0]), video_id="a")
+        self.watcher.start_tracking(str(self.files[1]), video_id="b")
+
+        self.assertEqual(self.retention.enforce(), [self.files[1]])
+        self.assertTrue(self.files[0].exists())
+        self.assertEqual(self.watcher.reclaimable_files(), [str(self.files[0])])
@@ -0,0 +1,63 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from simulate import Simulation, SimulationReport, SyntheticRecorder
+from uploaders.fake import FakeUploader
+
+
+class TestSimulation(TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.test_dir_path = Path(self.test_dir.name)
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_run(self):
+        recorder = SyntheticRecorder(
+            self.test_dir_path, count=4, size_mb=0.1, rate=600, burst=2, write_seconds=0.05, seed=1
+        )
+        uploader = FakeUploader()
+        simulation = Simulation(recorder, uploader, poll_interval=0.05, sample_interval=0.02)
+        report = simulation.run(timeout=30)
+
+        self.assertFalse(report.timed_out)
+        self.assertEqual(report.uploaded, 4)
+        self.assertEqual(report.failed, 0)
+        self.assertEqual(report.uploaded_bytes, sum(upload["size"] for upload in uploader.uploads))
+        self.assertGreater(report.uploaded_bytes, 4 * int(0.1 * 1024 * 1024))
+        self.assertEqual(len(report.latencies), 4)
+        self.assertTrue(all(latency > 0 for latency in report.latencies))
+        self.assertTrue(report.queue_depth)
+        self.assertEqual(report.queue_depth[-1][1], 0)
+        # Only the renamed kills are uploaded, never the growing recordings
+        self.assertEqual(len(uploader.uploads), 4)
+        self.assertTrue(all("(Kill)" in upload["file_path"] for upload in uploader.uploads))
+
+    def test_recorder_renames_kills(self):
+        recorder = SyntheticRecorder(
+            self.test_dir_path, count=3, size_mb=0.01, rate=6000, write_seconds=0
+        )
+        recorder.start()
+        recorder.join(10)
+
+        files = sorted(p.name for p in self.test_dir_path.iterdir())
+        self.assertEqual(len(files), 3)
+        self.assertTrue(all(name.endswith("[M] (Kill).mp4") for name in files))
+        self.assertEqual(sorted(Path(p).name for p in recorder.killed_at), files)
+
+
+def test_report_percentiles():
+    report = SimulationReport(uploaded=4, seconds=60, latencies=[4.0, 1.0, 3.0, 2.0])
+    assert report.percentile(50) == 2.0
+    assert report.percentile(99) == 4.0
+    assert report.uploads_per_minute == 4.0
+    assert report.meets_slo(4.0)
+    assert not report.meets_slo(3.0, percent=99)
+
+
+def test_report_empty():
+    report = SimulationReport()
+    assert report.percentile(95) == 0.0
+    assert report.max_queue_depth == 0
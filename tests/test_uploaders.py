@@ -0,0 +1,74 @@
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+import uploaders
+from uploaders import clear_uploaders, get_uploader, register_uploader, resolve_uploader
+from uploaders.fake import FakeUploader
+
+
+@pytest.fixture(autouse=True)
+def clean_instances():
+    clear_uploaders()
+    yield
+    clear_uploaders()
+
+
+def test_builtin_is_loaded_lazily(monkeypatch):
+    monkeypatch.delitem(sys.modules, "uploaders.youtube", raising=False)
+    uploader = get_uploader("fake")
+    assert isinstance(uploader, FakeUploader)
+    assert "uploaders.youtube" not in sys.modules
+
+
+def test_instances_are_shared():
+    assert get_uploader("fake") is get_uploader("fake")
+
+
+def test_dotted_path():
+    assert isinstance(get_uploader("uploaders.fake:FakeUploader"), FakeUploader)
+    assert isinstance(get_uploader("uploaders.fake.FakeUploader"), FakeUploader)
+
+
+def test_register_uploader():
+    custom = MagicMock()
+    register_uploader("custom", lambda: custom)
+    try:
+        assert get_uploader("custom") is custom
+    finally:
+        uploaders._registry.pop("custom")
+
+
+def test_entry_point(monkeypatch):
+    entry_point = MagicMock()
+    entry_point.load.return_value = FakeUploader
+
+    def mock_entry_points(group, name):
+        assert group == uploaders.ENTRY_POINT_GROUP
+        return [entry_point] if name == "plugin" else []
+
+    monkeypatch.setattr(uploaders, "entry_points", mock_entry_points)
+    assert resolve_uploader("plugin") is FakeUploader
+
+
+@pytest.mark.parametrize("name", ["unknown", "no.such.module:Uploader", "uploaders.fake:Missing"])
+def test_unsupported(name):
+    with pytest.raises(ValueError, match="Unsupported uploader"):
+        get_uploader(name)
+
+
+def test_fan_out_list():
+    uploader = get_uploader(["fake", "uploaders.fake:FakeUploader"])
+    assert list(uploader.uploaders) == ["fake", "uploaders.fake:FakeUploader"]
+    assert uploader.uploaders["fake"] is get_uploader("fake")
+    assert get_uploader(["fake", "uploaders.fake:FakeUploader"]) is uploader
+
+
+def test_fake_upload(tmp_path):
+    path = tmp_path / "vod.mp4"
+    path.write_bytes(b"abc")
+    uploader = get_uploader("fake")
+    assert uploader.upload_video(str(path), "title", "desc", ["tag"]) == "fake-1"
+    assert uploader.uploads[0]["size"] == 3
+    assert uploader.last_digest.startswith("sha256:")
@@ -3,7 +3,8 @@ from unittest.mock import patch
 
 import pytest
 
-from video import Video
+from mp4 import FTYP, box, moov_box
+from video import Video, format_duration
 
 
 @pytest.fixture
@@ -69,4 +70,51 @@ class TestVideo:
             mock_settings.youtube.description = "Raid fight on {unsupported}"
             video = Video(file=Path("2023-10-05 12-34-56 [M] Raid Kill.mp4"))
             with pytest.raises(Exception, match="Key not supported: unsupported"):
-                video.description
\ No newline at end of file
+                video.description
+
+    def test_boss(self, video_instance):
+        assert video_instance.boss == "Boss"
+
+    def test_playlist_ids(self, video_instance, mock_settings):
+        mock_settings.youtube.playlists = {"Mythic": "PL1", "Boss": "PL2", "Other": "PL3"}
+        assert video_instance.playlist_ids == ["PL1", "PL2"]
+
+    def test_metadata(self, tmp_path):
+        file = tmp_path / "2023-10-05 12-34-56 - Character - Boss [M] (Kill).mp4"
+        file.write_bytes(FTYP + moov_box(duration=3725, width=1920, height=1080))
+        video = Video(file=file)
+        assert video.has_moov
+        assert video.duration == 3725
+        assert video.resolution == "1920x1080"
+        assert video.is_valid()
+
+    def test_metadata_placeholders(self, tmp_path, mock_settings):
+        mock_settings.youtube.description = "{duration} at {resolution}"
+        file = tmp_path / "2023-10-05 12-34-56 - Character - Boss [M] (Kill).mp4"
+        file.write_bytes(FTYP + moov_box(duration=312, width=2560, height=1440))
+        assert Video(file=file).description == "5:12 at 2560x1440"
+        assert Video(file=tmp_path / "missing" / file.name).description == "unknown at unknown"
+
+    def test_incomplete_mp4_is_not_valid(self, tmp_path):
+        file = tmp_path / "2023-10-05 12-34-56 - Character - Boss [M] (Kill).mp4"
+        # Still recording, no moov box yet
+        file.write_bytes(FTYP + box(b"mdat", bytes(100)))
+        assert not Video(file=file).is_valid()
+        # Truncated
+        file.write_bytes((FTYP + moov_box(duration=60, width=1920, height=1080))[:-20])
+        assert not Video(file=file).has_moov
+        assert not Video(file=file).is_valid()
+
+    def test_other_containers_are_not_probed(self, tmp_path):
+        file = tmp_path / "2023-10-05 12-34-56 - Character - Boss [M] (Kill).mkv"
+        file.write_bytes(b"x" * 100)
+        video = Video(file=file)
+        assert video.metadata is None
+        assert video.is_valid()
+
+
+@pytest.mark.parametrize(
+    "seconds, expected", [(None, "unknown"), (59.6, "1:00"), (312, "5:12"), (3725, "1:02:05")]
+)
+def test_format_duration(seconds, expected):
+    assert format_duration(seconds) == expected
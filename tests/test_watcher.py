@@ -1,3 +1,4 @@
+import os
 import tempfile
 from pathlib import Path
 from unittest import TestCase
@@ -54,6 +55,37 @@ class TestFileWatcher(TestCase):
         )
         self.assertIsNotNone(cursor.fetchone())
 
+    def test_start_tracking_with_upload(self):
+        file_path = str(self.test_dir_path / 'test_file.txt')
+        self.watcher.start_tracking(file_path)
+        self.watcher.start_tracking(file_path, video_id='abc123', digest='sha256:00ff')
+        cursor = self.watcher.conn.execute(
+            f"SELECT video_id, digest FROM {self.watcher.table_name} WHERE file_path = ?", (file_path,)
+        )
+        self.assertEqual(cursor.fetchone(), ('abc123', 'sha256:00ff'))
+        self.assertEqual(self.watcher.get_digest(file_path), 'sha256:00ff')
+
+    def test_create_table_migrates_old_schema(self):
+        self.watcher.conn.execute(f"DROP TABLE {self.watcher.table_name}")
+        self.watcher.conn.execute(
+            f"CREATE TABLE {self.watcher.table_name} (id INTEGER PRIMARY KEY, file_path TEXT UNIQUE)"
+        )
+        self.watcher._create_table()
+        columns = {row[1] for row in self.watcher.conn.execute(f"PRAGMA table_info({self.watcher.table_name})")}
+        self.assertTrue({'video_id', 'digest', 'uploaded_at'} <= columns)
+
+    def test_enqueue_many(self):
+        file_paths = [str(self.test_dir_path / f'file{i}.txt') for i in range(5)]
+        self.watcher.start_tracking(file_paths[0])
+        self.assertEqual(self.watcher.enqueue_many(file_paths), 4)
+        self.assertEqual(self.watcher.queued_files(), file_paths[1:])
+        self.assertFalse(self.watcher.is_tracked(file_paths[1]))
+        self.assertEqual(self.watcher.tracked_files(), {file_paths[0]})
+
+        self.watcher.start_tracking(file_paths[1], video_id='abc')
+        self.assertTrue(self.watcher.is_tracked(file_paths[1]))
+        self.assertEqual(self.watcher.queued_files(), file_paths[2:])
+
     def test_stop_tracking(self):
         file_path = str(self.test_dir_path / 'test_file.txt')
         self.watcher.start_tracking(file_path)
@@ -74,4 +106,48 @@ class TestFileWatcher(TestCase):
         generator = self.watcher.start_watching()
         detected_files = sorted([next(generator), next(generator)])
         expected_files = sorted([file1, file2])
-        self.assertEqual(detected_files, expected_files)
\ No newline at end of file
+        self.assertEqual(detected_files, expected_files)
+
+    def make_files(self, count):
+        files = []
+        for i in range(count):
+            file = self.test_dir_path / f'file{i}.txt'
+            file.touch()
+            # Oldest last in name order
+            os.utime(file, (1000 - i, 1000 - i))
+            files.append(file)
+        return files
+
+    def test_start_watching_oldest_first(self):
+        files = self.make_files(5)
+        self.watcher.start_tracking(str(files[2]))
+        detected = list(self.watcher._discover(max_pending=100, window=60))
+        self.assertEqual(detected, [files[4], files[3], files[1], files[0]])
+
+    def test_discovery_is_bounded(self):
+        files = self.make_files(20)
+        listed = []
+        real_scandir = os.scandir
+
+        class CountingScandir:
+            def __init__(self, path):
+                self.entries = real_scandir(path)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                self.entries.close()
+
+            def __iter__(self):
+                for entry in self.entries:
+                    listed.append(entry.name)
+                    yield entry
+
+        with patch('watcher.os.scandir', CountingScandir):
+            generator = self.watcher._discover(max_pending=4, window=60)
+            first = next(generator)
+            # Yielded before the directory was fully listed
+            self.assertEqual(len(listed), 4)
+            detected = [first, *generator]
+        self.assertEqual(sorted(detected), sorted(files))
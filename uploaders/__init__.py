@@ -1,19 +1,121 @@
-from typing import Protocol
+import threading
+from importlib import import_module
+from importlib.metadata import entry_points
+from typing import BinaryIO, Callable, Optional, Protocol, runtime_checkable
 
 
 class UploaderProtocol(Protocol):
+    # Digest of the last uploaded file ('<algorithm>:<hex>'), if computed
+    last_digest: Optional[str]
+
     def upload_video(
         self, file_path: str, title: str, description: str, tags: list[str]
     ) -> str: ...
 
 
-def get_uploader(uploader_name: str) -> UploaderProtocol:
+@runtime_checkable
+class StreamUploaderProtocol(UploaderProtocol, Protocol):
+    """Uploader that can read the video from a seekable stream
+    instead of opening the file itself."""
+
+    def upload_stream(
+        self,
+        stream: BinaryIO,
+        file_path: str,
+        title: str,
+        description: str,
+        tags: list[str],
+    ) -> str: ...
+
+
+# Entry point group third party packages can register uploaders under
+ENTRY_POINT_GROUP = "wow_vod_uploader.uploaders"
+
+# Built-in uploaders, only imported once they are selected
+_registry: dict[str, str | Callable[[], UploaderProtocol]] = {
+    "youtube": "uploaders.youtube:YoutubeUploader",
+    "archive": "uploaders.archive:ArchiveUploader",
+    "fake": "uploaders.fake:FakeUploader",
+}
+_instances: dict[str | tuple[str, ...], UploaderProtocol] = {}
+_lock = threading.RLock()
+
+
+def register_uploader(
+    name: str, factory: str | Callable[[], UploaderProtocol]
+) -> None:
+    """Register an uploader under a name.
+
+    Args:
+        name (str): The name used in the config's `uploader` setting.
+        factory (str | Callable): A 'module:attribute' path, loaded on first use,
+            or a callable returning the uploader.
     """
-    Factory function to get the appropriate uploader instance based on the uploader name.
+    with _lock:
+        _registry[name] = factory
+        _instances.pop(name, None)
+
+
+def clear_uploaders() -> None:
+    """Drop the shared uploader instances, they are created again on next use."""
+    with _lock:
+        _instances.clear()
+
+
+def resolve_uploader(uploader_name: str) -> Callable[[], UploaderProtocol]:
+    """Find the factory for an uploader without creating it.
+
+    Looks up, in order: registered names, the `wow_vod_uploader.uploaders`
+    entry points and finally a dotted path ('package.module:Class' or
+    'package.module.Class').
+
+    Raises:
+        ValueError: If no uploader can be found for the name.
     """
-    from uploaders.youtube import YoutubeUploader
+    factory = _registry.get(uploader_name)
+    if factory is None:
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP, name=uploader_name):
+            return entry_point.load()
+        factory = uploader_name
 
-    if uploader_name == "youtube":
-        return YoutubeUploader()
-    else:
+    if callable(factory):
+        return factory
+
+    module_name, sep, attribute = factory.partition(":")
+    if not sep:
+        module_name, _, attribute = factory.rpartition(".")
+    if not module_name or not attribute:
         raise ValueError(f"Unsupported uploader: {uploader_name}")
+    try:
+        return getattr(import_module(module_name), attribute)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f"Unsupported uploader: {uploader_name} ({e})") from e
+
+
+def get_uploader(uploader_name: str | list[str]) -> UploaderProtocol:
+    """
+    Factory function to get the appropriate uploader instance based on the uploader name.
+    A list of names returns an uploader fanning out to each of them.
+    Instances are created once and shared by later calls.
+    """
+    key: str | tuple[str, ...] = (
+        tuple(uploader_name) if isinstance(uploader_name, list) else uploader_name
+    )
+    with _lock:
+        if key in _instances:
+            return _instances[key]
+
+        if isinstance(uploader_name, list):
+            from config import settings
+            from uploaders.fanout import FanOutUploader
+
+            uploader = FanOutUploader(
+                {name: get_uploader(name) for name in uploader_name},
+                chunk_size=settings.fan_out.chunk_size,
+                buffer_chunks=settings.fan_out.buffer_chunks,
+            )
+        else:
+            uploader = resolve_uploader(uploader_name)()
+
+        _instances[key] = uploader
+        return uploader
@@ -0,0 +1,168 @@
+import os
+import shutil
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from config import settings
+from logger import Logger, get_logger
+from uploaders import StreamUploaderProtocol
+from uploaders.hashing import StreamHasher
+
+log: Logger = get_logger(__name__)
+
+COPY_SIZE = 8 * 1024 * 1024
+
+
+class ArchiveUploader(StreamUploaderProtocol):
+    """Archives videos to another local (or mounted network) directory.
+
+    Files are moved or hard-linked when possible. Otherwise they are copied
+    in the kernel with copy_file_range (which reflinks on file systems that
+    support it) or sendfile, and only as a last resort through a buffer.
+
+    Streamed uploads (as a fan-out sink) are always copies: the other
+    sinks still read the file, so `move` does not apply to them.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, move: Optional[bool] = None) -> None:
+        if directory is None:
+            if settings.archive is None:
+                raise ValueError("The archive uploader needs an 'archive' section in the config")
+            directory = settings.archive.path
+        if move is None:
+            move = settings.archive.move if settings.archive is not None else False
+        self.directory: Path = Path(directory)
+        self.move: bool = move
+        self.last_digest: Optional[str] = None
+        self._warned_move: bool = False
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def upload_video(
+        self, file_path: str, title: str, description: str, tags: list[str]
+    ) -> str:
+        self.last_digest = None
+        source = Path(file_path)
+        destination: Path = self.directory / source.name
+        if self._is_archived(source, destination):
+            return str(destination)
+
+        if self.move and self._rename(source, destination):
+            method = "rename"
+        elif not self.move and self._link(source, destination):
+            method = "hardlink"
+        else:
+            method = self._copy(source, destination)
+            shutil.copystat(source, destination)
+            if self.move:
+                source.unlink()
+
+        log.info(f"Archived {source.name} to {self.directory} ({method})")
+        return str(destination)
+
+    def upload_stream(
+        self,
+        stream: BinaryIO,
+        file_path: str,
+        title: str,
+        description: str,
+        tags: list[str],
+    ) -> str:
+        self.last_digest = None
+        source = Path(file_path)
+        destination: Path = self.directory / source.name
+        if self._is_archived(source, destination):
+            return str(destination)
+
+        if self.move and not self._warned_move:
+            log.warning(f"Streamed VODs are copied to {self.directory}, not moved")
+            self._warned_move = True
+
+        hasher = StreamHasher()
+        partial: Path = destination.with_name(destination.name + ".partial")
+        stream.seek(0)
+        with open(partial, "wb") as out:
+            while chunk := stream.read(COPY_SIZE):
+                hasher.update(out.tell(), chunk)
+                out.write(chunk)
+        os.replace(partial, destination)
+        shutil.copystat(source, destination)
+
+        self.last_digest = hasher.digest
+        log.info(f"Archived {source.name} to {self.directory} (stream)")
+        return str(destination)
+
+    # -- Private methods --
+    @staticmethod
+    def _is_archived(source: Path, destination: Path) -> bool:
+        if destination.exists() and destination.stat().st_size == source.stat().st_size:
+            log.debug(f"{source.name} is already archived")
+            return True
+        return False
+
+    @staticmethod
+    def _rename(source: Path, destination: Path) -> bool:
+        try:
+            os.replace(source, destination)
+            return True
+        except OSError as e:
+            log.debug(f"Cannot rename {source} to {destination}: {e}")
+            return False
+
+    @staticmethod
+    def _link(source: Path, destination: Path) -> bool:
+        try:
+            if destination.exists():
+                destination.unlink()
+            os.link(source, destination)
+            return True
+        except OSError as e:
+            log.debug(f"Cannot hard link {source} to {destination}: {e}")
+            return False
+
+    @staticmethod
+    def _copy(source: Path, destination: Path) -> str:
+        """Copy through a temporary file, using the cheapest method available.
+
+        Returns:
+            str: The name of the method that was used.
+        """
+        partial: Path = destination.with_name(destination.name + ".partial")
+        size: int = source.stat().st_size
+        with open(source, "rb") as src, open(partial, "wb") as dst:
+            for method, copy in (
+                ("copy_file_range", _copy_file_range),
+                ("sendfile", _sendfile),
+            ):
+                try:
+                    copy(src.fileno(), dst.fileno(), size)
+                    break
+                except (AttributeError, OSError) as e:
+                    log.debug(f"{method} not available for {source}: {e}")
+                    # Start over, the previous method may have copied part of the file
+                    dst.truncate(0)
+            else:
+                method = "buffered"
+                src.seek(0)
+                dst.seek(0)
+                shutil.copyfileobj(src, dst, COPY_SIZE)
+        os.replace(partial, destination)
+        return method
+
+
+def _copy_file_range(src: int, dst: int, size: int) -> None:
+    offset: int = 0
+    while offset < size:
+        copied: int = os.copy_file_range(src, dst, size - offset, offset, offset)
+        if copied == 0:
+            raise OSError(f"copy_file_range stopped after {offset} of {size} bytes")
+        offset += copied
+
+
+def _sendfile(src: int, dst: int, size: int) -> None:
+    offset: int = 0
+    os.lseek(dst, 0, os.SEEK_SET)
+    while offset < size:
+        sent: int = os.sendfile(dst, src, offset, size - offset)
+        if sent == 0:
+            raise OSError(f"sendfile stopped after {offset} of {size} bytes")
+        offset += sent
@@ -0,0 +1,66 @@
+import time
+from typing import BinaryIO, Optional
+
+from logger import Logger, get_logger
+from uploaders import StreamUploaderProtocol
+from uploaders.hashing import StreamHasher
+
+log: Logger = get_logger(__name__)
+
+READ_SIZE = 4 * 1024 * 1024
+
+
+class FakeUploader(StreamUploaderProtocol):
+    """Reads the video like a real uploader would, but sends it nowhere.
+
+    Useful for tests, dry runs and simulations.
+    """
+
+    def __init__(self, bytes_per_second: Optional[float] = None, latency: float = 0.0) -> None:
+        # Simulated upload bandwidth, unlimited if None
+        self.bytes_per_second: Optional[float] = bytes_per_second
+        # Simulated processing time per upload, in seconds
+        self.latency: float = latency
+        self.last_digest: Optional[str] = None
+        self.uploads: list[dict] = []
+
+    def upload_video(
+        self, file_path: str, title: str, description: str, tags: list[str]
+    ) -> str:
+        with open(file_path, "rb") as fd:
+            return self.upload_stream(fd, file_path, title, description, tags)
+
+    def upload_stream(
+        self,
+        stream: BinaryIO,
+        file_path: str,
+        title: str,
+        description: str,
+        tags: list[str],
+    ) -> str:
+        self.last_digest = None
+        hasher = StreamHasher()
+        size: int = 0
+        stream.seek(0)
+        while chunk := stream.read(READ_SIZE):
+            hasher.update(size, chunk)
+            size += len(chunk)
+            if self.bytes_per_second:
+                time.sleep(len(chunk) / self.bytes_per_second)
+        time.sleep(self.latency)
+
+        video_id: str = f"fake-{len(self.uploads) + 1}"
+        self.last_digest = hasher.digest
+        self.uploads.append(
+            {
+                "id": video_id,
+                "file_path": file_path,
+                "title": title,
+                "description": description,
+                "tags": tags,
+                "size": size,
+                "digest": self.last_digest,
+            }
+        )
+        log.info(f"Fake upload finished: {video_id} ({title})")
+        return video_id
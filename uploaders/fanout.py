@@ -0,0 +1,291 @@
+import io
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from logger import Logger, get_logger
+from quota import QuotaExceededError
+from uploaders import StreamUploaderProtocol, UploaderProtocol
+from uploaders.hashing import StreamHasher
+
+__all__ = ["FanOutUploader", "SinkStream", "SinkState"]
+
+log: Logger = get_logger(__name__)
+
+# Seconds a sink waits for a chunk before checking whether it was detached
+POLL_INTERVAL = 0.05
+
+
+class SinkStream(io.RawIOBase):
+    """Seekable, read-only view of a file that is fed chunk by chunk
+    from a shared reader instead of reading the file itself.
+
+    At most `buffer_chunks` chunks are queued. Once the reader detaches
+    a slow sink, the stream reads whatever is not buffered from the file.
+    Seeking back behind the retained window (e.g. a rewound resumable
+    upload) also falls back to reading the file directly.
+    """
+
+    def __init__(self, file_path: str, size: int, buffer_chunks: int) -> None:
+        super().__init__()
+        self.file_path: str = file_path
+        self.size: int = size
+        self.queue: queue.Queue = queue.Queue(maxsize=buffer_chunks)
+        self.detached: bool = False
+        self.consumed: int = 0
+        self._buffer = bytearray()
+        self._buffer_start: int = 0
+        self._pos: int = 0
+        self._eof: bool = False
+        self._file: Optional[io.BufferedReader] = None
+
+    # -- io.RawIOBase --
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.size - self._pos
+        end: int = min(self._pos + size, self.size)
+        if end <= self._pos:
+            return b""
+
+        if not self.detached:
+            self._fill(end)
+        buffer_end: int = self._buffer_start + len(self._buffer)
+        if self._buffer_start <= self._pos and (end <= buffer_end or self._eof):
+            data = bytes(self._buffer[self._pos - self._buffer_start : end - self._buffer_start])
+        else:
+            data = self._read_file(self._pos, end - self._pos)
+
+        # Keep the last read around for rewinds, drop everything before it
+        if self._pos >= buffer_end:
+            self._buffer.clear()
+            self._buffer_start = buffer_end
+        elif self._pos > self._buffer_start:
+            del self._buffer[: self._pos - self._buffer_start]
+            self._buffer_start = self._pos
+
+        self._pos += len(data)
+        self.consumed = max(self.consumed, self._pos)
+        return data
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        super().close()
+
+    # -- Reader side --
+    def feed(
+        self, chunk: Optional[bytes], block: bool, timeout: Optional[float] = None
+    ) -> None:
+        """Queue the next chunk of the file, or None once the whole file was fed.
+
+        Raises:
+            queue.Full: If the buffer is full.
+        """
+        self.queue.put(chunk, block=block, timeout=timeout)
+
+    def detach(self) -> None:
+        """Stop being fed, the stream reads the rest of the file itself."""
+        self.detached = True
+
+    # -- Private methods --
+    def _fill(self, end: int) -> None:
+        """Pull chunks from the queue until the buffer reaches `end`."""
+        while not self._eof and self._buffer_start + len(self._buffer) < end:
+            try:
+                # Once detached, only take what is already queued
+                item = self.queue.get(block=not self.detached, timeout=POLL_INTERVAL)
+            except queue.Empty:
+                # Detaching does not wake a sink waiting on an empty queue
+                if self.detached:
+                    break
+                continue
+            if item is None:
+                self._eof = True
+            else:
+                self._buffer += item
+
+    def _read_file(self, offset: int, length: int) -> bytes:
+        if self._file is None:
+            self._file = open(self.file_path, "rb")
+        self._file.seek(offset)
+        return self._file.read(length)
+
+
+@dataclass
+class SinkState:
+    name: str
+    uploader: UploaderProtocol
+    stream: Optional[SinkStream] = None
+    # pending, running, succeeded, failed
+    status: str = "pending"
+    result: Optional[str] = None
+    error: Optional[Exception] = None
+    thread: Optional[threading.Thread] = field(default=None, repr=False)
+
+    @property
+    def progress(self) -> float:
+        """Fraction of the file read by the sink, 1.0 once it succeeded"""
+        if self.status == "succeeded":
+            return 1.0
+        if self.stream is None or not self.stream.size:
+            return 0.0
+        return self.stream.consumed / self.stream.size
+
+    @property
+    def fed(self) -> bool:
+        """True while the shared reader still pushes chunks to this sink"""
+        return (
+            self.stream is not None
+            and not self.stream.detached
+            and self.status in ("pending", "running")
+        )
+
+
+class FanOutUploader(UploaderProtocol):
+    """Uploads each file to several uploaders while reading it only once.
+
+    Uploaders implementing `upload_stream` get their own buffered stream.
+    Others fall back to `upload_video` and read the file themselves.
+    The first uploader is the primary one: its result is returned and its
+    failure fails the upload, failures of the other sinks are only logged.
+    An exhausted YouTube quota fails the upload whichever sink hit it, so
+    the video is retried once the quota resets.
+    """
+
+    def __init__(
+        self,
+        uploaders: dict[str, UploaderProtocol],
+        chunk_size: int = 4 * 1024 * 1024,
+        buffer_chunks: int = 16,
+    ) -> None:
+        if not uploaders:
+            raise ValueError("FanOutUploader needs at least one uploader")
+        self.uploaders: dict[str, UploaderProtocol] = uploaders
+        self.chunk_size: int = chunk_size
+        self.buffer_chunks: int = buffer_chunks
+        self.last_digest: Optional[str] = None
+        self.sinks: list[SinkState] = []
+
+    def upload_video(
+        self, file_path: str, title: str, description: str, tags: list[str]
+    ) -> str:
+        self.last_digest = None
+        size: int = os.path.getsize(file_path)
+        self.sinks = [SinkState(name, uploader) for name, uploader in self.uploaders.items()]
+
+        for sink in self.sinks:
+            if isinstance(sink.uploader, StreamUploaderProtocol):
+                sink.stream = SinkStream(file_path, size, self.buffer_chunks)
+                target, args = sink.uploader.upload_stream, (sink.stream, file_path)
+            else:
+                log.debug(f"{sink.name} does not support streams, it reads {file_path} itself")
+                target, args = sink.uploader.upload_video, (file_path,)
+            sink.thread = threading.Thread(
+                target=self._run_sink,
+                args=(sink, target, (*args, title, description, tags)),
+                name=f"fanout-{sink.name}",
+                daemon=True,
+            )
+            sink.thread.start()
+
+        self.last_digest = self._feed(file_path, size)
+
+        for sink in self.sinks:
+            sink.thread.join()
+            if sink.stream is not None:
+                sink.stream.close()
+
+        primary: SinkState = self.sinks[0]
+        for sink in self.sinks[1:]:
+            if sink.status == "failed" and not isinstance(sink.error, QuotaExceededError):
+                log.error(f"Upload to {sink.name} failed: {sink.error}")
+        if primary.status == "failed":
+            raise primary.error
+        for sink in self.sinks[1:]:
+            if isinstance(sink.error, QuotaExceededError):
+                raise sink.error
+        return primary.result
+
+    # -- Private methods --
+    def _run_sink(self, sink: SinkState, target, args: tuple) -> None:
+        sink.status = "running"
+        try:
+            sink.result = target(*args)
+            sink.status = "succeeded"
+            log.info(f"Upload to {sink.name} finished: {sink.result}")
+        except Exception as e:
+            sink.error = e
+            sink.status = "failed"
+            if sink.stream is not None:
+                # Nobody consumes this stream anymore
+                sink.stream.detach()
+
+    def _feed(self, file_path: str, size: int) -> Optional[str]:
+        """Read the file once, hash it and feed every streaming sink.
+
+        A sink whose buffer is full gets detached as soon as another
+        sink has drained its own buffer, so it does not stall the others.
+
+        Returns:
+            Optional[str]: The digest of the file.
+        """
+        hasher = StreamHasher()
+        offset: int = 0
+        with open(file_path, "rb") as fd:
+            while offset < size and any(sink.fed for sink in self.sinks):
+                chunk: bytes = fd.read(self.chunk_size)
+                if not chunk:
+                    break
+                hasher.update(offset, chunk)
+                offset += len(chunk)
+                for sink in self.sinks:
+                    self._feed_sink(sink, chunk)
+
+            # Hash the rest if no sink is fed anymore
+            while chunk := fd.read(self.chunk_size):
+                hasher.update(offset, chunk)
+                offset += len(chunk)
+
+        for sink in self.sinks:
+            self._feed_sink(sink, None)
+        return hasher.finalize(size)
+
+    def _feed_sink(self, sink: SinkState, chunk: Optional[bytes]) -> None:
+        while sink.fed:
+            try:
+                sink.stream.feed(chunk, block=True, timeout=0.01)
+                return
+            except queue.Full:
+                pass
+            # Only detach the sink once it holds up another one that ran dry
+            if any(
+                other is not sink and other.fed and other.stream.queue.empty()
+                for other in self.sinks
+            ):
+                log.warning(f"{sink.name} is lagging, it continues reading on its own")
+                sink.stream.detach()
+                return
@@ -0,0 +1,74 @@
+import hashlib
+from typing import BinaryIO, Optional
+
+__all__ = ["StreamHasher"]
+
+READ_SIZE = 4 * 1024 * 1024
+
+
+class StreamHasher:
+    """Rolling hash over an upload stream, fed with each chunk as it goes out.
+
+    Chunks are keyed by their offset so that retried or rewound chunks
+    (e.g. after the server only acknowledged part of a chunk) are not
+    hashed twice, and any gap is read back from the source.
+    """
+
+    def __init__(self, algorithm: str = "sha256", source: Optional[BinaryIO] = None) -> None:
+        self.algorithm: str = algorithm
+        self.source: Optional[BinaryIO] = source
+        self.position: int = 0
+        self._hash = hashlib.new(algorithm)
+
+    def update(self, offset: int, data: bytes) -> None:
+        """Add a chunk that starts at `offset` of the stream.
+
+        Args:
+            offset (int): Offset of the first byte of `data` in the stream.
+            data (bytes): The chunk contents.
+        """
+        if offset > self.position:
+            self._read_gap(offset)
+
+        end = offset + len(data)
+        if end <= self.position:
+            # Chunk was already hashed (retry/rewind)
+            return
+
+        self._hash.update(memoryview(data)[self.position - offset :])
+        self.position = end
+
+    def finalize(self, size: int) -> str:
+        """Hash any bytes up to `size` that were never sent as a chunk.
+
+        Args:
+            size (int): Total size of the stream.
+
+        Returns:
+            str: The digest prefixed by the algorithm name.
+        """
+        if self.position < size:
+            self._read_gap(size)
+        return self.digest
+
+    @property
+    def digest(self) -> str:
+        """Returns the digest of the bytes seen so far, e.g. 'sha256:ab12...'"""
+        return f"{self.algorithm}:{self._hash.hexdigest()}"
+
+    def _read_gap(self, offset: int) -> None:
+        """Read the bytes between the current position and `offset` from the source."""
+        if self.source is None:
+            raise ValueError(
+                f"Cannot hash gap {self.position}-{offset} without a source stream"
+            )
+
+        restore = self.source.tell()
+        self.source.seek(self.position)
+        while self.position < offset:
+            data = self.source.read(min(READ_SIZE, offset - self.position))
+            if not data:
+                raise ValueError(f"Stream ended at {self.position}, expected {offset}")
+            self._hash.update(data)
+            self.position += len(data)
+        self.source.seek(restore)
@@ -0,0 +1,243 @@
+import threading
+from typing import Any, Optional
+
+from googleapiclient.errors import HttpError
+
+from logger import Logger, get_logger
+from quota import QuotaTracker
+from watcher import FileWatcher
+
+log: Logger = get_logger(__name__)
+
+# Most requests per batch / ids per videos.list call the API accepts
+BATCH_SIZE = 50
+# Processing statuses after which a video is no longer polled
+FINAL_STATUSES = {
+    "succeeded",
+    "failed",
+    "terminated",
+    "processed",
+    "rejected",
+    "deleted",
+    "missing",
+}
+MAX_ATTEMPTS = 3
+# Playlist id of the pending processing checks in the database
+PROCESSING = ""
+
+
+class PostUploadQueue:
+    """Queues the API calls that follow an upload and sends them in bulk.
+
+    Playlist insertions go out as batch requests of up to 50 calls and the
+    processing status of up to 50 videos is polled with one videos.list
+    call. Results are written back to the tracking database.
+
+    Pending operations are kept in the database as well, so the ones
+    waiting on quota survive a restart.
+    """
+
+    table_name: str = "post_upload"
+
+    def __init__(
+        self,
+        uploader: Any,
+        watcher: FileWatcher,
+        track_processing: bool = False,
+        interval: float = 60.0,
+    ) -> None:
+        self.watcher: FileWatcher = watcher
+        self.quota: QuotaTracker = uploader.quota
+        self.track_processing: bool = track_processing
+        self.interval: float = interval
+        # A service of its own, the HTTP client is not thread-safe
+        self.api_service = uploader.get_authenticated_service()
+        # (video_id, playlist_id) -> attempts made
+        self.playlist_items: dict[tuple[str, str], int] = {}
+        self.processing: list[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._create_table()
+        self._load()
+
+    # -- Private methods --
+    def _create_table(self) -> None:
+        """Create the table if it does not exist."""
+        self.watcher.db.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                video_id TEXT NOT NULL,
+                playlist_id TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (video_id, playlist_id)
+            )
+        """
+        )
+
+    def _load(self) -> None:
+        """Queue the operations still pending from a previous run."""
+        cursor = self.watcher.conn.execute(
+            f"SELECT video_id, playlist_id, attempts FROM {self.table_name} ORDER BY rowid"
+        )
+        for video_id, playlist_id, attempts in cursor:
+            if playlist_id != PROCESSING:
+                self.playlist_items[(video_id, playlist_id)] = attempts
+            elif self.track_processing:
+                self.processing.append(video_id)
+        if self.playlist_items or self.processing:
+            log.info(
+                f"Resuming {len(self.playlist_items)} playlist insertions and "
+                f"{len(self.processing)} processing checks"
+            )
+
+    def _done(self, video_id: str, playlist_id: str) -> None:
+        # Not waited for, the writes of a whole batch share one commit
+        self.watcher.db.execute(
+            f"DELETE FROM {self.table_name} WHERE video_id = ? AND playlist_id = ?",
+            (video_id, playlist_id),
+            wait=False,
+        )
+
+    def enqueue(self, video_id: str, playlist_ids: list[str]) -> None:
+        """Queue the follow-up operations for an uploaded video.
+
+        Args:
+            video_id (str): The id of the uploaded video.
+            playlist_ids (list[str]): The playlists to add the video to.
+        """
+        pending: list[str] = list(playlist_ids)
+        with self._lock:
+            for playlist_id in playlist_ids:
+                self.playlist_items.setdefault((video_id, playlist_id), 0)
+            if self.track_processing and video_id not in self.processing:
+                self.processing.append(video_id)
+                pending.append(PROCESSING)
+        self.watcher.db.executemany(
+            f"INSERT OR IGNORE INTO {self.table_name} (video_id, playlist_id) VALUES (?, ?)",
+            [(video_id, playlist_id) for playlist_id in pending],
+        )
+
+    # -- Background thread --
+    def start(self) -> None:
+        """Flush the queue every `interval` seconds on a background thread."""
+        self._thread = threading.Thread(target=self._run, name="post-upload", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread after a last flush."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._flush_logged()
+        self._flush_logged()
+
+    def _flush_logged(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            log.error("Post-upload flush failed")
+            log.exception(e)
+
+    # -- API calls --
+    def flush(self) -> None:
+        """Send all queued playlist insertions and poll processing status."""
+        self.add_to_playlists()
+        self.poll_processing()
+
+    def add_to_playlists(self) -> None:
+        """Insert the queued playlist items, 50 per batch request."""
+        with self._lock:
+            items: list[tuple[str, str]] = list(self.playlist_items)
+
+        for start in range(0, len(items), BATCH_SIZE):
+            batch_items = items[start : start + BATCH_SIZE]
+            if not self.quota.can_afford("playlistItems.insert", len(batch_items)):
+                log.warning(f"Quota too low, {len(items) - start} playlist insertions deferred")
+                return
+
+            batch = self.api_service.new_batch_http_request(callback=self._on_playlist_item)
+            for video_id, playlist_id in batch_items:
+                batch.add(
+                    self.api_service.playlistItems().insert(
+                        part="snippet",
+                        body={
+                            "snippet": {
+                                "playlistId": playlist_id,
+                                "resourceId": {"kind": "youtube#video", "videoId": video_id},
+                            }
+                        },
+                    ),
+                    request_id=f"{video_id}|{playlist_id}",
+                )
+            batch.execute()
+            # Every call in the batch is charged, failed ones included
+            self.quota.spend("playlistItems.insert", len(batch_items))
+
+    def _on_playlist_item(self, request_id: str, response: Any, exception: Optional[Exception]) -> None:
+        video_id, playlist_id = request_id.split("|", 1)
+        key = (video_id, playlist_id)
+        with self._lock:
+            if exception is None:
+                self.playlist_items.pop(key, None)
+            else:
+                self.playlist_items[key] += 1
+                attempts: int = self.playlist_items[key]
+                retry: bool = attempts < MAX_ATTEMPTS and not (
+                    isinstance(exception, HttpError) and exception.resp.status == 404
+                )
+                if not retry:
+                    self.playlist_items.pop(key)
+
+        if exception is not None and retry:
+            self.watcher.db.execute(
+                f"UPDATE {self.table_name} SET attempts = ? "
+                "WHERE video_id = ? AND playlist_id = ?",
+                (attempts, video_id, playlist_id),
+                wait=False,
+            )
+        else:
+            self._done(video_id, playlist_id)
+
+        if exception is None:
+            log.info(f"Added {video_id} to playlist {playlist_id}")
+            self.watcher.add_playlist(video_id, playlist_id)
+        else:
+            log.warning(
+                f"Could not add {video_id} to playlist {playlist_id}: {exception}"
+                + ("" if retry else " (giving up)")
+            )
+
+    def poll_processing(self) -> None:
+        """Fetch the processing status of queued videos, 50 per videos.list call."""
+        with self._lock:
+            video_ids: list[str] = list(self.processing)
+
+        for start in range(0, len(video_ids), BATCH_SIZE):
+            if not self.quota.can_afford("videos.list"):
+                log.warning("Quota too low, processing status polling deferred")
+                return
+            chunk = video_ids[start : start + BATCH_SIZE]
+            response: dict = (
+                self.api_service.videos()
+                .list(part="status,processingDetails", id=",".join(chunk), maxResults=BATCH_SIZE)
+                .execute()
+            )
+            self.quota.spend("videos.list")
+
+            statuses: dict[str, str] = {video_id: "missing" for video_id in chunk}
+            for item in response.get("items", []):
+                statuses[item["id"]] = item.get("processingDetails", {}).get(
+                    "processingStatus", item.get("status", {}).get("uploadStatus", "unknown")
+                )
+
+            for video_id, status in statuses.items():
+                self.watcher.set_processing_status(video_id, status)
+                if status in FINAL_STATUSES:
+                    log.info(f"Processing of {video_id} finished: {status}")
+                    with self._lock:
+                        self.processing.remove(video_id)
+                    self._done(video_id, PROCESSING)
@@ -1,34 +1,71 @@
+import mimetypes
 import os
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, BinaryIO, Optional
 
 from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
 
 from logger import Logger, get_logger
+from quota import QuotaExceededError, QuotaTracker
 from src.config import settings
-from uploaders import UploaderProtocol
+from uploaders import StreamUploaderProtocol
+from uploaders.hashing import StreamHasher
 
 log: Logger = get_logger(__name__)
 
+CHUNK_SIZE = 4 * 1024 * 1024
 
-class YoutubeUploader(UploaderProtocol):
+
+class HashingMediaUpload(MediaIoBaseUpload):
+    """Resumable media upload that hashes each chunk as it is sent,
+    so the file only has to be read once.
+    """
+
+    def __init__(
+        self, fd, mimetype: str, chunksize: int = CHUNK_SIZE, algorithm: str = "sha256"
+    ) -> None:
+        super().__init__(fd, mimetype, chunksize=chunksize, resumable=True)
+        self.hasher = StreamHasher(algorithm, source=fd)
+
+    def has_stream(self) -> bool:
+        # Force the client to fetch every chunk through getbytes()
+        return False
+
+    def getbytes(self, begin: int, length: int) -> bytes:
+        data: bytes = super().getbytes(begin, length)
+        self.hasher.update(begin, data)
+        return data
+
+    @property
+    def digest(self) -> str:
+        return self.hasher.finalize(self.size())
+
+
+class YoutubeUploader(StreamUploaderProtocol):
     def __init__(
         self,
         client_secrets_file: Path = settings.auth.client_secrets,
         token: Path = settings.auth.token,
         api_service_name: str = "youtube",
         api_version: str = "v3",
+        quota: Optional[QuotaTracker] = None,
     ) -> None:
         self.client_secrets_file: Path = client_secrets_file
         self.token: Path = token
         self.api_service_name: str = api_service_name
         self.api_version: str = api_version
         self.scopes = ["https://www.googleapis.com/auth/youtube.upload"]
+        if settings.youtube.playlists or settings.youtube.track_processing:
+            # Needed for playlistItems.insert and videos.list
+            self.scopes.append("https://www.googleapis.com/auth/youtube")
+        self.last_digest: Optional[str] = None
+        self.quota: QuotaTracker = quota or QuotaTracker()
         self.api_service = self.get_authenticated_service()
 
     def get_authenticated_service(self) -> Any:
@@ -36,9 +73,13 @@ class YoutubeUploader(UploaderProtocol):
         while True:  # Persistent loop to handle token refreshing
             try:
                 if os.path.exists(self.token) and os.path.getsize(self.token) > 0:
+                    # Load the scopes granted to the token to compare them
                     creds: Credentials = Credentials.from_authorized_user_file(
-                        self.token, self.scopes
+                        self.token
                     )
+                    if not creds.has_scopes(self.scopes):
+                        log.info("Token is missing scopes. Re-authenticating...")
+                        creds = None
                 if not creds or not creds.valid:
                     if creds and creds.expired and creds.refresh_token:
                         creds.refresh(Request())
@@ -58,6 +99,17 @@ class YoutubeUploader(UploaderProtocol):
 
     def upload_video(
         self, file_path: str, title: str, description: str, tags: list[str]
+    ) -> str:
+        with open(file_path, "rb") as fd:
+            return self.upload_stream(fd, file_path, title, description, tags)
+
+    def upload_stream(
+        self,
+        stream: BinaryIO,
+        file_path: str,
+        title: str,
+        description: str,
+        tags: list[str],
     ) -> str:
         body: dict = {
             "snippet": {
@@ -68,19 +120,32 @@ class YoutubeUploader(UploaderProtocol):
             },
             "status": {"privacyStatus": settings.youtube.visibility},
         }
-        media = MediaFileUpload(file_path, resumable=True, chunksize=4 * 1024 * 1024)
+        self.last_digest = None
+        # Fail before reading anything if the upload cannot succeed today
+        self.quota.check("videos.insert")
+        mimetype: str = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        media = HashingMediaUpload(stream, mimetype, chunksize=CHUNK_SIZE)
         request = self.api_service.videos().insert(
             part="snippet,status", body=body, media_body=media
         )
         response = None
         prev_percent = 0
-        while response is None:
-            status, response = request.next_chunk()
-            if not status:
-                continue
-            percent: int = int(status.progress() * 100)
-            if percent % 5 == 0 and percent != prev_percent:
-                log.info(f"Uploaded {percent}%")
-                prev_percent: int = percent
-        log.info(f"Video uploaded successfully: {response['id']}")
+        try:
+            while response is None:
+                status, response = request.next_chunk()
+                if not status:
+                    continue
+                percent: int = int(status.progress() * 100)
+                if percent % 5 == 0 and percent != prev_percent:
+                    log.info(f"Uploaded {percent}%", extra={"rate_limit": True})
+                    prev_percent: int = percent
+        except HttpError as e:
+            if e.resp.status == 403 and b"quotaExceeded" in (e.content or b""):
+                self.quota.exhaust()
+                raise QuotaExceededError("videos.insert", self.quota.resets_at()) from e
+            raise
+        self.quota.spend("videos.insert")
+        self.last_digest = media.digest
+        log.info(f"Video uploaded successfully: {response['id']} ({self.last_digest})")
+        log.info(f"{self.quota.remaining_uploads()} uploads left in today's YouTube quota")
         return response["id"]